@@ -52,6 +52,10 @@ class LnLstmPolicy(object):
         self.S = S
         self.pi = pi
         self.vf = vf
+        self.a0 = a0
+        self.v0 = v0
+        self.neglogp0 = neglogp0
+        self.snew = snew
         self.step = step
         self.value = value
 
@@ -94,6 +98,10 @@ class LstmPolicy(object):
         self.S = S
         self.pi = pi
         self.vf = vf
+        self.a0 = a0
+        self.v0 = v0
+        self.neglogp0 = neglogp0
+        self.snew = snew
         self.step = step
         self.value = value
 
@@ -126,6 +134,9 @@ class CnnPolicy(object):
         self.X = X
         self.pi = pi
         self.vf = vf
+        self.a0 = a0
+        self.v0 = vf
+        self.neglogp0 = neglogp0
         self.step = step
         self.value = value
 
@@ -164,5 +175,42 @@ class MlpPolicy(object):
         self.X = X
         self.pi = pi
         self.vf = vf
+        self.a0 = a0
+        self.v0 = vf
+        self.neglogp0 = neglogp0
+        self.step = step
+        self.value = value
+
+def policy_elements(policy):
+    """The graph elements of a policy, for U.cached_graph"""
+    return {k: getattr(policy, k, None) for k in ['X', 'M', 'S', 'pi', 'vf', 'a0', 'v0', 'neglogp0', 'snew']}
+
+class ImportedPolicy(object):
+    """
+    A policy with the interface of the ones above, around graph elements from policy_elements()
+    (e.g. after U.cached_graph imported a saved graph)
+    """
+    def __init__(self, sess, elements):
+        for (k, v) in elements.items():
+            setattr(self, k, v)
+        X, M, S, a0, v0, neglogp0, snew = [elements[k] for k in ['X', 'M', 'S', 'a0', 'v0', 'neglogp0', 'snew']]
+        if S is None:
+            self.initial_state = None
+
+            def step(ob, *_args, **_kwargs):
+                a, v, neglogp = sess.run([a0, v0, neglogp0], {X:ob})
+                return a, v, self.initial_state, neglogp
+
+            def value(ob, *_args, **_kwargs):
+                return sess.run(v0, {X:ob})
+        else:
+            self.initial_state = np.zeros(S.get_shape().as_list(), dtype=np.float32)
+
+            def step(ob, state, mask):
+                return sess.run([a0, v0, snew, neglogp0], {X:ob, S:state, M:mask})
+
+            def value(ob, state, mask):
+                return sess.run(v0, {X:ob, S:state, M:mask})
+
         self.step = step
         self.value = value
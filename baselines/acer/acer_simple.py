@@ -307,6 +307,8 @@ class Acer():
             # For true episode rewards, see the monitor files in the log folder.
             logger.record_tabular("mean_episode_length", self.episode_stats.mean_length())
             logger.record_tabular("mean_episode_reward", self.episode_stats.mean_reward())
+            if buffer is not None:
+                logger.record_tabular("buffer_bytes", buffer.resident_nbytes())
             for name, val in zip(names_ops, values_ops):
                 logger.record_tabular(name, float(val))
             logger.dump_tabular()
@@ -315,7 +317,7 @@ class Acer():
 def learn(policy, env, seed, nsteps=20, nstack=4, total_timesteps=int(80e6), q_coef=0.5, ent_coef=0.01,
           max_grad_norm=10, lr=7e-4, lrschedule='linear', rprop_epsilon=1e-5, rprop_alpha=0.99, gamma=0.99,
           log_interval=100, buffer_size=50000, replay_ratio=4, replay_start=10000, c=10.0,
-          trust_region=True, alpha=0.99, delta=1):
+          trust_region=True, alpha=0.99, delta=1, memory_budget=None):
     print("Running Acer Simple")
     print(locals())
     tf.reset_default_graph()
@@ -333,7 +335,7 @@ def learn(policy, env, seed, nsteps=20, nstack=4, total_timesteps=int(80e6), q_c
 
     runner = Runner(env=env, model=model, nsteps=nsteps, nstack=nstack)
     if replay_ratio > 0:
-        buffer = Buffer(env=env, nsteps=nsteps, nstack=nstack, size=buffer_size)
+        buffer = Buffer(env=env, nsteps=nsteps, nstack=nstack, size=buffer_size, memory_budget=memory_budget)
     else:
         buffer = None
     nbatch = nenvs*nsteps
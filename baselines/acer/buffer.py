@@ -1,8 +1,10 @@
 import numpy as np
+from baselines import logger
+from baselines.common.misc_util import parse_bytes, pretty_bytes
 
 class Buffer(object):
     # gets obs, actions, rewards, mu's, (states, masks), dones
-    def __init__(self, env, nsteps, nstack, size=50000):
+    def __init__(self, env, nsteps, nstack, size=50000, memory_budget=None):
         self.nenv = env.num_envs
         self.nsteps = nsteps
         self.nh, self.nw, self.nc = env.observation_space.shape
@@ -10,6 +12,15 @@ class Buffer(object):
         self.nbatch = self.nenv * self.nsteps
         self.size = size // (self.nsteps)  # Each loc contains nenv * nsteps frames, thus total buffer is nenv * size frames
 
+        # bytes per loc: uint8 enc_obs, int32 actions, float32 rewards, bool dones, float32 mus, bool masks
+        nact = env.action_space.n
+        self.loc_nbytes = self.nenv * ((self.nsteps + self.nstack) * self.nh * self.nw * self.nc
+                                       + self.nsteps * (4 + 4 + 1) + self.nsteps * nact * 4 + (self.nsteps + 1))
+        if memory_budget is not None:
+            self.size = min(self.size, parse_bytes(memory_budget) // self.loc_nbytes)
+        assert self.size > 0, 'memory budget too small for a single buffer location'
+        logger.info('Acer buffer: %d frames, %s when full' % (self.size * self.nsteps * self.nenv, pretty_bytes(self.nbytes)))
+
         # Memory
         self.enc_obs = None
         self.actions = None
@@ -22,6 +33,15 @@ class Buffer(object):
         self.next_idx = 0
         self.num_in_buffer = 0
 
+    @property
+    def nbytes(self):
+        # projected footprint of the full buffer
+        return self.size * self.loc_nbytes
+
+    def resident_nbytes(self):
+        # bytes of the locs written so far
+        return self.num_in_buffer * self.loc_nbytes
+
     def has_atleast(self, frames):
         # Frames per env, so total (nenv * frames) Frames needed
         # Each buffer loc has nenv * nsteps frames
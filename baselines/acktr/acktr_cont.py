@@ -64,6 +64,7 @@ def learn(env, policy, vf, gamma, lam, timesteps_per_batch, num_timesteps,
     update_op, q_runner = optim.minimize(loss, loss_sampled, var_list=pi_var_list)
     do_update = U.function(inputs, update_op)
     U.initialize()
+    U.maybe_trace_session()
 
     # start queue runners
     enqueue_threads = []
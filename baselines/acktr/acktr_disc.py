@@ -1,9 +1,11 @@
+import inspect
 import os.path as osp
 import time
 import joblib
 import numpy as np
 import tensorflow as tf
 from baselines import logger
+import baselines.common.tf_util as U
 
 from baselines.common import set_global_seeds, explained_variance
 
@@ -11,59 +13,90 @@ from baselines.a2c.a2c import Runner
 from baselines.a2c.utils import discount_with_dones
 from baselines.a2c.utils import Scheduler, find_trainable_variables
 from baselines.a2c.utils import cat_entropy, mse
-from baselines.acktr import kfac
+from baselines.a2c import utils as a2c_utils
+from baselines.a2c.policies import ImportedPolicy, policy_elements
+from baselines.acktr import kfac, kfac_utils
 
 
 class Model(object):
 
     def __init__(self, policy, ob_space, ac_space, nenvs,total_timesteps, nprocs=32, nsteps=20,
                  ent_coef=0.01, vf_coef=0.5, vf_fisher_coef=1.0, lr=0.25, max_grad_norm=0.5,
-                 kfac_clip=0.001, lrschedule='linear'):
+                 kfac_clip=0.001, lrschedule='linear', graph_cache=None):
         config = tf.ConfigProto(allow_soft_placement=True,
                                 intra_op_parallelism_threads=nprocs,
                                 inter_op_parallelism_threads=nprocs)
         config.gpu_options.allow_growth = True
         self.sess = sess = tf.Session(config=config)
-        nact = ac_space.n
+        U.maybe_trace_session(sess)
         nbatch = nenvs * nsteps
-        A = tf.placeholder(tf.int32, [nbatch])
-        ADV = tf.placeholder(tf.float32, [nbatch])
-        R = tf.placeholder(tf.float32, [nbatch])
-        PG_LR = tf.placeholder(tf.float32, [])
-        VF_LR = tf.placeholder(tf.float32, [])
-
-        self.model = step_model = policy(sess, ob_space, ac_space, nenvs, 1, reuse=False)
-        self.model2 = train_model = policy(sess, ob_space, ac_space, nenvs*nsteps, nsteps, reuse=True)
-
-        logpac = tf.nn.sparse_softmax_cross_entropy_with_logits(logits=train_model.pi, labels=A)
-        self.logits = logits = train_model.pi
-
-        ##training loss
-        pg_loss = tf.reduce_mean(ADV*logpac)
-        entropy = tf.reduce_mean(cat_entropy(train_model.pi))
-        pg_loss = pg_loss - ent_coef * entropy
-        vf_loss = tf.reduce_mean(mse(tf.squeeze(train_model.vf), R))
-        train_loss = pg_loss + vf_coef * vf_loss
-
-
-        ##Fisher loss construction
-        self.pg_fisher = pg_fisher_loss = -tf.reduce_mean(logpac)
-        sample_net = train_model.vf + tf.random_normal(tf.shape(train_model.vf))
-        self.vf_fisher = vf_fisher_loss = - vf_fisher_coef*tf.reduce_mean(tf.pow(train_model.vf - tf.stop_gradient(sample_net), 2))
-        self.joint_fisher = joint_fisher_loss = pg_fisher_loss + vf_fisher_loss
-
-        self.params=params = find_trainable_variables("model")
-
-        self.grads_check = grads = tf.gradients(train_loss,params)
-
-        with tf.device('/gpu:0'):
-            self.optim = optim = kfac.KfacOptimizer(learning_rate=PG_LR, clip_kl=kfac_clip,\
-                momentum=0.9, kfac_update=1, epsilon=0.01,\
-                stats_decay=0.99, async=1, cold_iter=10, max_grad_norm=max_grad_norm)
-
-            update_stats_op = optim.compute_and_apply_stats(joint_fisher_loss, var_list=params)
-            train_op, q_runner = optim.apply_gradients(list(zip(grads,params)))
-        self.q_runner = q_runner
+        built = {}
+
+        def build():
+            A = tf.placeholder(tf.int32, [nbatch])
+            ADV = tf.placeholder(tf.float32, [nbatch])
+            R = tf.placeholder(tf.float32, [nbatch])
+            PG_LR = tf.placeholder(tf.float32, [])
+            VF_LR = tf.placeholder(tf.float32, [])
+
+            built['step_model'] = step_model = policy(sess, ob_space, ac_space, nenvs, 1, reuse=False)
+            built['train_model'] = train_model = policy(sess, ob_space, ac_space, nenvs*nsteps, nsteps, reuse=True)
+
+            logpac = tf.nn.sparse_softmax_cross_entropy_with_logits(logits=train_model.pi, labels=A)
+
+            ##training loss
+            pg_loss = tf.reduce_mean(ADV*logpac)
+            entropy = tf.reduce_mean(cat_entropy(train_model.pi))
+            pg_loss = pg_loss - ent_coef * entropy
+            vf_loss = tf.reduce_mean(mse(tf.squeeze(train_model.vf), R))
+            train_loss = pg_loss + vf_coef * vf_loss
+
+
+            ##Fisher loss construction
+            pg_fisher_loss = -tf.reduce_mean(logpac)
+            sample_net = train_model.vf + tf.random_normal(tf.shape(train_model.vf))
+            vf_fisher_loss = - vf_fisher_coef*tf.reduce_mean(tf.pow(train_model.vf - tf.stop_gradient(sample_net), 2))
+            joint_fisher_loss = pg_fisher_loss + vf_fisher_loss
+
+            params = find_trainable_variables("model")
+
+            grads = tf.gradients(train_loss,params)
+
+            with tf.device('/gpu:0'):
+                built['optim'] = optim = kfac.KfacOptimizer(learning_rate=PG_LR, clip_kl=kfac_clip,\
+                    momentum=0.9, kfac_update=1, epsilon=0.01,\
+                    stats_decay=0.99, async=1, cold_iter=10, max_grad_norm=max_grad_norm)
+
+                update_stats_op = optim.compute_and_apply_stats(joint_fisher_loss, var_list=params)
+                train_op, q_runner = optim.apply_gradients(list(zip(grads,params)))
+            if q_runner is not None:
+                tf.train.add_queue_runner(q_runner) # exported with the graph
+            return dict(A=A, ADV=ADV, R=R, PG_LR=PG_LR, pg_loss=pg_loss, entropy=entropy, vf_loss=vf_loss,
+                        pg_fisher=pg_fisher_loss, vf_fisher=vf_fisher_loss, joint_fisher=joint_fisher_loss,
+                        grads=grads, train_op=train_op, step_model=policy_elements(step_model),
+                        train_model=policy_elements(train_model))
+
+        # KFAC stats and preconditioning (and unrolled LSTM policies) take a while to build;
+        # with a graph cache, later launches with the same configuration import the graph instead
+        graph_config = dict(model='acktr_disc', policy='%s.%s' % (policy.__module__, getattr(policy, '__name__', repr(policy))),
+                            ob_space=[list(ob_space.shape), str(ob_space.dtype)], nact=ac_space.n, nenvs=nenvs,
+                            nsteps=nsteps, ent_coef=ent_coef, vf_coef=vf_coef, vf_fisher_coef=vf_fisher_coef,
+                            max_grad_norm=max_grad_norm, kfac_clip=kfac_clip)
+        g = U.cached_graph(build, graph_config, graph_cache, sources=[inspect.getmodule(policy), a2c_utils, kfac, kfac_utils, U])
+        A, ADV, R, PG_LR = g['A'], g['ADV'], g['R'], g['PG_LR']
+        pg_loss, entropy, vf_loss, train_op = g['pg_loss'], g['entropy'], g['vf_loss'], g['train_op']
+        self.model = step_model = built.get('step_model') or ImportedPolicy(sess, g['step_model'])
+        self.model2 = train_model = built.get('train_model') or ImportedPolicy(sess, g['train_model'])
+        self.logits = train_model.pi
+        self.pg_fisher, self.vf_fisher, self.joint_fisher = g['pg_fisher'], g['vf_fisher'], g['joint_fisher']
+        self.params = params = find_trainable_variables("model")
+        self.grads_check = g['grads']
+        # The KfacOptimizer is a Python object and does not survive a graph import, so self.optim
+        # is None then. Training only needs its ops (train_op, the stats updates run by train_op and
+        # the queue runner), which are part of the graph.
+        self.optim = built.get('optim')
+        q_runners = tf.get_collection(tf.GraphKeys.QUEUE_RUNNERS)
+        self.q_runner = q_runner = q_runners[0] if q_runners else None
         self.lr = Scheduler(v=lr, nvalues=total_timesteps, schedule=lrschedule)
 
         def train(obs, states, rewards, masks, actions, values):
@@ -107,7 +140,7 @@ class Model(object):
 
 def learn(policy, env, seed, total_timesteps=int(40e6), gamma=0.99, log_interval=1, nprocs=32, nsteps=20,
                  ent_coef=0.01, vf_coef=0.5, vf_fisher_coef=1.0, lr=0.25, max_grad_norm=0.5,
-                 kfac_clip=0.001, save_interval=None, lrschedule='linear'):
+                 kfac_clip=0.001, save_interval=None, lrschedule='linear', graph_cache=None):
     tf.reset_default_graph()
     set_global_seeds(seed)
 
@@ -117,7 +150,7 @@ def learn(policy, env, seed, total_timesteps=int(40e6), gamma=0.99, log_interval
     make_model = lambda : Model(policy, ob_space, ac_space, nenvs, total_timesteps, nprocs=nprocs, nsteps
                                 =nsteps, ent_coef=ent_coef, vf_coef=vf_coef, vf_fisher_coef=
                                 vf_fisher_coef, lr=lr, max_grad_norm=max_grad_norm, kfac_clip=kfac_clip,
-                                lrschedule=lrschedule)
+                                lrschedule=lrschedule, graph_cache=graph_cache)
     if save_interval and logger.get_dir():
         import cloudpickle
         with open(osp.join(logger.get_dir(), 'make_model.pkl'), 'wb') as fh:
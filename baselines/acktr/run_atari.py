@@ -6,16 +6,18 @@ from baselines.common.cmd_util import make_atari_env, atari_arg_parser
 from baselines.common.vec_env.vec_frame_stack import VecFrameStack
 from baselines.ppo2.policies import CnnPolicy
 
-def train(env_id, num_timesteps, seed, num_cpu):
+def train(env_id, num_timesteps, seed, num_cpu, graph_cache=None):
     env = VecFrameStack(make_atari_env(env_id, num_cpu, seed), 4)
     policy_fn = CnnPolicy
-    learn(policy_fn, env, seed, total_timesteps=int(num_timesteps * 1.1), nprocs=num_cpu)
+    learn(policy_fn, env, seed, total_timesteps=int(num_timesteps * 1.1), nprocs=num_cpu, graph_cache=graph_cache)
     env.close()
 
 def main():
-    args = atari_arg_parser().parse_args()
+    parser = atari_arg_parser()
+    parser.add_argument('--graph-cache', help='directory of saved graphs to import instead of building', default=None)
+    args = parser.parse_args()
     logger.configure()
-    train(args.env, num_timesteps=args.num_timesteps, seed=args.seed, num_cpu=32)
+    train(args.env, num_timesteps=args.num_timesteps, seed=args.seed, num_cpu=32, graph_cache=args.graph_cache)
 
 if __name__ == '__main__':
     main()
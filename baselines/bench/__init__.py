@@ -1,2 +1,14 @@
+import sys
+import types
 from baselines.bench.benchmarks import *
-from baselines.bench.monitor import *
\ No newline at end of file
+from baselines.bench.results import *
+
+class _BenchModule(types.ModuleType):
+    # bench.Monitor imports gym on first use, so that reading results does not
+    def __getattr__(self, name):
+        if name == 'Monitor':
+            from baselines.bench.monitor import Monitor
+            return Monitor
+        raise AttributeError("module %r has no attribute %r" % (self.__name__, name))
+
+sys.modules[__name__].__class__ = _BenchModule
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Import time of the main entry points, each measured in a fresh interpreter, and which heavy
+dependencies they pull in. Fails if a module imports a dependency it is expected to avoid,
+or takes longer than --max-seconds.
+
+    python -m baselines.bench.benchmark_imports
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+HEAVY = ['tensorflow', 'gym', 'mpi4py', 'scipy', 'cv2', 'pandas', 'matplotlib']
+
+# module -> heavy dependencies it must not import
+ENTRY_POINTS = [
+    ('baselines.logger', HEAVY),
+    ('baselines.bench.results', HEAVY),
+    ('baselines.bench', HEAVY),
+    ('baselines.common', HEAVY),
+    ('baselines.results_plotter', ['tensorflow', 'gym', 'mpi4py', 'cv2', 'pandas']),
+    ('baselines.confidence_plotter', ['tensorflow', 'gym', 'mpi4py', 'cv2']),
+    ('baselines.common.cmd_util', ['tensorflow', 'mpi4py', 'cv2']),
+    ('baselines.common.tf_util', []),
+]
+
+_PROBE = """
+import json, sys, time
+tstart = time.perf_counter()
+import %s
+dt = time.perf_counter() - tstart
+print(json.dumps({'seconds': dt, 'heavy': [m for m in %r if m in sys.modules]}))
+"""
+
+def measure(module, repeats):
+    """Best of repeats import times of module in a fresh interpreter, and the heavy modules loaded"""
+    best = None
+    for _ in range(repeats):
+        out = subprocess.run([sys.executable, '-c', _PROBE % (module, HEAVY)], stdout=subprocess.PIPE,
+                             stderr=subprocess.PIPE, universal_newlines=True)
+        if out.returncode != 0:
+            return None, out.stderr.strip().splitlines()[-1]
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        if best is None or result['seconds'] < best['seconds']:
+            best = result
+    return best, None
+
+def main():
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--max-seconds', type=float, default=None)
+    parser.add_argument('modules', nargs='*', help='default: the main entry points')
+    args = parser.parse_args()
+
+    entry_points = [(m, []) for m in args.modules] or ENTRY_POINTS
+    failed = False
+    for module, forbidden in entry_points:
+        result, error = measure(module, args.repeats)
+        if result is None:
+            print('{:32s} {:>9s}  {}'.format(module, 'error', error))
+            failed = True
+            continue
+        bad = [m for m in result['heavy'] if m in forbidden]
+        slow = args.max_seconds is not None and result['seconds'] > args.max_seconds
+        failed = failed or bool(bad) or slow
+        print('{:32s} {:8.3f}s  {}{}{}'.format(module, result['seconds'], ' '.join(result['heavy']),
+            '  UNEXPECTED: ' + ' '.join(bad) if bad else '', '  SLOW' if slow else ''))
+    sys.exit(int(failed))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,20 +1,23 @@
-__all__ = ['Monitor', 'get_monitor_files', 'load_results']
+__all__ = ['Monitor', 'get_monitor_files', 'load_results', 'ResultsLoader']
 
 import gym
 from gym.core import Wrapper
 import time
-from glob import glob
 import csv
+import os
 import os.path as osp
 import json
+from baselines.bench.results import EXT, get_monitor_files, load_results, ResultsLoader, LoadMonitorResultsError
 
 class Monitor(Wrapper):
-    EXT = "monitor.csv"
+    EXT = EXT
     f = None
 
-    def __init__(self, env, filename, allow_early_resets=False, reset_keywords=()):
+    def __init__(self, env, filename, allow_early_resets=False, reset_keywords=(), flush_interval=0.):
         Wrapper.__init__(self, env=env)
         self.tstart = time.time()
+        self.flush_interval = flush_interval # seconds between flushes of the monitor file, 0 flushes every episode
+        self.tflush = self.tstart
         if filename is None:
             self.f = None
             self.logger = None
@@ -67,7 +70,9 @@ class Monitor(Wrapper):
             epinfo.update(self.current_reset_info)
             if self.logger:
                 self.logger.writerow(epinfo)
-                self.f.flush()
+                if time.time() - self.tflush >= self.flush_interval:
+                    self.f.flush()
+                    self.tflush = time.time()
             info['episode'] = epinfo
         self.total_steps += 1
         return (ob, rew, done, info)
@@ -88,49 +93,6 @@ class Monitor(Wrapper):
     def get_episode_times(self):
         return self.episode_times
 
-class LoadMonitorResultsError(Exception):
-    pass
-
-def get_monitor_files(dir):
-    return glob(osp.join(dir, "*" + Monitor.EXT))
-
-def load_results(dir):
-    import pandas
-    monitor_files = (
-        glob(osp.join(dir, "*monitor.json")) + 
-        glob(osp.join(dir, "*monitor.csv"))) # get both csv and (old) json files
-    if not monitor_files:
-        raise LoadMonitorResultsError("no monitor files of the form *%s found in %s" % (Monitor.EXT, dir))
-    dfs = []
-    headers = []
-    for fname in monitor_files:
-        with open(fname, 'rt') as fh:
-            if fname.endswith('csv'):
-                firstline = fh.readline()
-                assert firstline[0] == '#'
-                header = json.loads(firstline[1:])
-                df = pandas.read_csv(fh, index_col=None)
-                headers.append(header)
-            elif fname.endswith('json'): # Deprecated json format
-                episodes = []
-                lines = fh.readlines()
-                header = json.loads(lines[0])
-                headers.append(header)
-                for line in lines[1:]:
-                    episode = json.loads(line)
-                    episodes.append(episode)
-                df = pandas.DataFrame(episodes)
-            else:
-                assert 0, 'unreachable'
-            df['t'] += header['t_start']
-        dfs.append(df)
-    df = pandas.concat(dfs)
-    df.sort_values('t', inplace=True)
-    df.reset_index(inplace=True)
-    df['t'] -= min(header['t_start'] for header in headers)
-    df.headers = headers # HACK to preserve backwards compatibility
-    return df
-
 def test_monitor():
     env = gym.make("CartPole-v1")
     env.seed(0)
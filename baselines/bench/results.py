@@ -0,0 +1,159 @@
+"""
+Reading monitor files (written by Monitor and VecMonitor) without importing gym.
+"""
+__all__ = ['get_monitor_files', 'load_results', 'ResultsLoader', 'LoadMonitorResultsError']
+
+import time
+from glob import glob
+import csv
+import os
+import os.path as osp
+import io
+import json
+
+EXT = "monitor.csv"
+
+class LoadMonitorResultsError(Exception):
+    pass
+
+def get_monitor_files(dir):
+    return glob(osp.join(dir, "*" + EXT))
+
+class _MonitorFile(object):
+    """
+    One monitor file, read incrementally: only complete lines past the last byte offset are parsed.
+    The rows themselves are kept by the ResultsLoader, tagged with this file's id.
+    """
+    def __init__(self, fname, id):
+        self.fname = fname
+        self.id = id
+        self.offset = 0
+        self.ino = None
+        self.head = b'' # raw header line, to recognize a file replaced under the same name
+        self.header = None
+        self.columns = None
+        self.nrows = 0
+
+    def read(self):
+        """
+        Returns (new rows or None, whether the file was replaced or truncated and re-read from the start)
+        """
+        import pandas
+        with open(self.fname, 'rb') as fh:
+            st = os.fstat(fh.fileno())
+            reset = self.offset > 0 and (st.st_ino != self.ino or st.st_size < self.offset
+                                         or fh.read(len(self.head)) != self.head)
+            if reset:
+                self.__init__(self.fname, self.id)
+            self.ino = st.st_ino
+            if st.st_size == self.offset:
+                return None, reset
+            fh.seek(self.offset)
+            data = fh.read(st.st_size - self.offset)
+        end = data.rfind(b'\n') + 1 # a partially written line waits for the next read
+        if self.offset == 0 and end:
+            self.head = data[:data.index(b'\n') + 1]
+        self.offset += end
+        lines = data[:end].decode('utf-8').splitlines()
+        if self.header is None and lines:
+            line = lines.pop(0)
+            if self.fname.endswith('csv'):
+                assert line[0] == '#'
+                line = line[1:]
+            self.header = json.loads(line)
+        if self.fname.endswith('csv'):
+            if self.columns is None and lines:
+                self.columns = next(csv.reader([lines.pop(0)]))
+            if not lines:
+                return None, reset
+            df = pandas.read_csv(io.StringIO('\n'.join(lines)), header=None, names=self.columns, index_col=None)
+        elif self.fname.endswith('json'): # Deprecated json format
+            if not lines:
+                return None, reset
+            df = pandas.DataFrame([json.loads(line) for line in lines])
+        else:
+            assert 0, 'unreachable'
+        df.index = pandas.RangeIndex(self.nrows, self.nrows + len(df))
+        self.nrows += len(df)
+        df['t'] += self.header['t_start']
+        df['_file'] = self.id
+        return df, reset
+
+class ResultsLoader(object):
+    """
+    Keeps the episodes of all monitor files in dir merged and sorted by time, parsing only
+    what was appended since the last update(). Hold on to one to poll a directory cheaply;
+    load_results(dir) reads everything every time.
+    """
+    def __init__(self, dir):
+        self.dir = dir
+        self.files = {}
+        self.nfiles = 0 # ids handed out so far
+        self.df = None # merged rows, t in absolute time, with the id of their file in _file
+
+    def update(self):
+        """
+        Reads new rows from every monitor file; returns them as a frame (like load_results), or None
+        """
+        monitor_files = set(
+            glob(osp.join(self.dir, "*monitor.json")) +
+            glob(osp.join(self.dir, "*monitor.csv"))) # get both csv and (old) json files
+        if not monitor_files:
+            raise LoadMonitorResultsError("no monitor files of the form *%s found in %s" % (EXT, self.dir))
+        dropped = set(self.files[fname].id for fname in self.files if fname not in monitor_files)
+        self.files = {fname: f for (fname, f) in self.files.items() if fname in monitor_files}
+        new = []
+        for fname in sorted(monitor_files):
+            if fname not in self.files:
+                self.files[fname] = _MonitorFile(fname, self.nfiles)
+                self.nfiles += 1
+            f = self.files[fname]
+            df, reset = f.read()
+            if reset:
+                dropped.add(f.id)
+            if df is not None:
+                new.append(df)
+        if dropped and self.df is not None:
+            self.df = self.df[~self.df['_file'].isin(dropped)]
+        if new:
+            # already sorted runs, cheap for a stable sort
+            self.df = self._sorted(new if self.df is None else [self.df] + new)
+        return self._output(self._sorted(new)) if new else None
+
+    def load(self):
+        """
+        All rows so far, in the format of load_results
+        """
+        self.update()
+        if self.df is None or not len(self.df):
+            raise LoadMonitorResultsError("no complete episodes in the monitor files in %s" % self.dir)
+        return self._output(self.df)
+
+    def tail(self, poll_interval=1.):
+        """
+        Yields the new rows every time episodes are appended to the monitor files; never returns.
+        """
+        while True:
+            df = self.update()
+            if df is None:
+                time.sleep(poll_interval)
+            else:
+                yield df
+
+    def _sorted(self, dfs):
+        import pandas
+        return pandas.concat(dfs).sort_values('t', kind='mergesort')
+
+    def _output(self, df):
+        headers = [f.header for f in self.files.values() if f.header is not None]
+        df = df.drop('_file', axis=1).reset_index()
+        df['t'] -= min(header['t_start'] for header in headers)
+        df.headers = headers # HACK to preserve backwards compatibility
+        return df
+
+def load_results(dir):
+    """
+    Episodes of all monitor files in dir, sorted by time. Use a ResultsLoader to re-read a
+    directory incrementally.
+    """
+    return ResultsLoader(dir).load()
@@ -65,7 +65,7 @@ class EpisodicLifeEnv(gym.Wrapper):
 
     def step(self, action):
         obs, reward, done, info = self.env.step(action)
-        self.was_real_done = done
+        self.was_real_done = info['real_done'] = done
         # check current lives, make loss of life terminal,
         # then update lives to handle bonus lives
         lives = self.env.unwrapped.ale.lives()
@@ -125,6 +125,11 @@ class ClipRewardEnv(gym.RewardWrapper):
     def __init__(self, env):
         gym.RewardWrapper.__init__(self, env)
 
+    def step(self, action):
+        obs, reward, done, info = self.env.step(action)
+        info['raw_reward'] = reward
+        return obs, self.reward(reward), done, info
+
     def reward(self, reward):
         """Bin reward to {+1, 0, -1} by its sign."""
         return np.sign(reward)
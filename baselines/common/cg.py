@@ -1,12 +1,25 @@
 import numpy as np
-def cg(f_Ax, b, cg_iters=10, callback=None, verbose=False, residual_tol=1e-10):
+def cg(f_Ax, b, cg_iters=10, callback=None, verbose=False, residual_tol=1e-10, precond=None):
     """
     Demmel p 312
+
+    precond: optional preconditioner M^-1, given either as an array holding the
+    inverse of a diagonal preconditioner or as a callable r -> M^-1 r
     """
-    p = b.copy()
+    if precond is None:
+        apply_precond = None
+    elif callable(precond):
+        apply_precond = precond
+    else:
+        precond = np.asarray(precond)
+        apply_precond = lambda r: precond * r
+
     r = b.copy()
+    z = r if apply_precond is None else apply_precond(r)
+    p = z.copy()
     x = np.zeros_like(b)
     rdotr = r.dot(r)
+    rdotz = r.dot(z)
 
     fmtstr =  "%10i %10.3g %10.3g"
     titlestr =  "%10s %10s %10s"
@@ -16,19 +29,75 @@ def cg(f_Ax, b, cg_iters=10, callback=None, verbose=False, residual_tol=1e-10):
         if callback is not None:
             callback(x)
         if verbose: print(fmtstr % (i, rdotr, np.linalg.norm(x)))
-        z = f_Ax(p)
-        v = rdotr / p.dot(z)
+        Ap = f_Ax(p)
+        v = rdotz / p.dot(Ap)
         x += v*p
-        r -= v*z
-        newrdotr = r.dot(r)
-        mu = newrdotr/rdotr
-        p = r + mu*p
+        r -= v*Ap
+        z = r if apply_precond is None else apply_precond(r)
+        newrdotz = r.dot(z)
+        mu = newrdotz/rdotz
+        p = z + mu*p
 
-        rdotr = newrdotr
+        rdotz = newrdotz
+        rdotr = r.dot(r)
         if rdotr < residual_tol:
             break
 
     if callback is not None:
         callback(x)
     if verbose: print(fmtstr % (i+1, rdotr, np.linalg.norm(x)))  # pylint: disable=W0631
-    return x
\ No newline at end of file
+    return x
+
+def diag_estimate(f_Ax, n, nprobes=4, dtype='float32'):
+    """
+    Hutchinson estimate of diag(A) from nprobes Rademacher matrix-vector products:
+    diag(A) ~= mean_k z_k * A z_k
+    """
+    diag = np.zeros(n, dtype)
+    for _ in range(nprobes):
+        z = (2 * np.random.randint(0, 2, size=n) - 1).astype(dtype)
+        diag += z * f_Ax(z)
+    return diag / nprobes
+
+def jacobi_precond(diag, damping=0., rel_floor=1e-3):
+    """
+    Inverse of a (damped) diagonal estimate, suitable as the precond argument of cg.
+    Few-probe estimates of a PSD diagonal can be negative or tiny: their magnitude is used,
+    and entries are floored at rel_floor times its mean so that none blows up.
+    """
+    diag = np.abs(diag)
+    return 1. / np.maximum(diag + damping, rel_floor * diag.mean() + 1e-8)
+
+def get_precond(kind, f_Ax, n, damping=0., nprobes=4, reduce=None):
+    """
+    cg preconditioner of the given kind (None or 'jacobi') for f_Ax + damping * I.
+    reduce is applied to the diagonal estimate, e.g. to average the probes of MPI workers,
+    which then need not agree across ranks.
+    """
+    if kind is None:
+        return None
+    elif kind == 'jacobi':
+        diag = diag_estimate(f_Ax, n, nprobes=nprobes)
+        if reduce is not None:
+            diag = reduce(diag)
+        return jacobi_precond(diag, damping)
+    else:
+        raise ValueError('Unknown cg_precond: %s' % (kind,))
+
+def test_cg():
+    np.random.seed(0)
+    n = 20
+    A = np.random.randn(n, n)
+    A = A.dot(A.T) + np.diag(np.logspace(0, 3, n))
+    b = np.random.randn(n)
+    x = np.linalg.solve(A, b)
+    xcg = cg(lambda p: A.dot(p), b, cg_iters=n*5)
+    xpcg = cg(lambda p: A.dot(p), b, cg_iters=n*5, precond=1./np.diag(A))
+    assert np.allclose(x, xcg, atol=1e-4)
+    assert np.allclose(x, xpcg, atol=1e-4)
+    dhat = diag_estimate(lambda p: A.dot(p), n, nprobes=1000, dtype='float64')
+    assert np.allclose(dhat, np.diag(A), rtol=0.5)
+    # a single noisy probe must still give a usable preconditioner
+    M = get_precond('jacobi', lambda p: A.dot(p), n, damping=1e-2, nprobes=1)
+    assert np.isfinite(M).all() and (M > 0).all()
+    assert np.allclose(x, cg(lambda p: A.dot(p), b, cg_iters=n*5, precond=M), atol=1e-4)
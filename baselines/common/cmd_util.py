@@ -7,24 +7,31 @@ import gym
 from baselines import logger
 from baselines.bench import Monitor
 from baselines.common import set_global_seeds
-from baselines.common.atari_wrappers import make_atari, wrap_deepmind
 from baselines.common.vec_env.subproc_vec_env import SubprocVecEnv
-from mpi4py import MPI
+from baselines.common.vec_env.vec_monitor import VecMonitor
 
-def make_atari_env(env_id, num_env, seed, wrapper_kwargs=None, start_index=0):
+def make_atari_env(env_id, num_env, seed, wrapper_kwargs=None, start_index=0, vec_monitor=False):
     """
     Create a wrapped, monitored SubprocVecEnv for Atari.
+    vec_monitor: one VecMonitor in this process instead of a Monitor per worker. It counts whole
+    games with unclipped scores like Monitor does, but not the extra steps taken on reset.
     """
     if wrapper_kwargs is None: wrapper_kwargs = {}
     def make_env(rank): # pylint: disable=C0111
         def _thunk():
+            from baselines.common.atari_wrappers import make_atari, wrap_deepmind # cv2, only in the workers
             env = make_atari(env_id)
             env.seed(seed + rank)
-            env = Monitor(env, logger.get_dir() and os.path.join(logger.get_dir(), str(rank)))
+            if not vec_monitor:
+                env = Monitor(env, logger.get_dir() and os.path.join(logger.get_dir(), str(rank)))
             return wrap_deepmind(env, **wrapper_kwargs)
         return _thunk
     set_global_seeds(seed)
-    return SubprocVecEnv([make_env(i + start_index) for i in range(num_env)])
+    venv = SubprocVecEnv([make_env(i + start_index) for i in range(num_env)])
+    if vec_monitor:
+        venv = VecMonitor(venv, logger.get_dir() and os.path.join(logger.get_dir(), str(start_index)),
+                          reward_key='raw_reward', done_key='real_done')
+    return venv
 
 def make_mujoco_env(env_id, seed):
     """
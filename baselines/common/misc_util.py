@@ -1,4 +1,3 @@
-import gym
 import numpy as np
 import os
 import pickle
@@ -119,6 +118,24 @@ def pretty_eta(seconds_left):
     return 'less than a minute'
 
 
+_BYTE_UNITS = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30, 'T': 1 << 40}
+
+def parse_bytes(size):
+    """Number of bytes in a size given as a number or a string like '512M', '4G' or '1.5T'."""
+    if isinstance(size, str):
+        size = size.strip().upper().rstrip('B')
+        if size and size[-1] in _BYTE_UNITS:
+            return int(float(size[:-1]) * _BYTE_UNITS[size[-1]])
+    return int(float(size))
+
+def pretty_bytes(nbytes):
+    """Print a number of bytes in human readable format, e.g. 1.5G."""
+    for unit in ['T', 'G', 'M', 'K']:
+        if nbytes >= _BYTE_UNITS[unit]:
+            return '%.1f%s' % (nbytes / _BYTE_UNITS[unit], unit)
+    return '%dB' % nbytes
+
+
 class RunningAvg(object):
     def __init__(self, gamma, init_value=None):
         """Keep a running estimate of a quantity. This is a bit like mean
@@ -187,6 +204,7 @@ def get_wrapper_by_name(env, classname):
     wrapper: gym.Wrapper
         wrapper named classname
     """
+    import gym
     currentenv = env
     while True:
         if classname == currentenv.class_name():
@@ -2,9 +2,14 @@ from mpi4py import MPI
 import baselines.common.tf_util as U
 import tensorflow as tf
 import numpy as np
+import zlib
+from baselines import logger
+from baselines.common.mpi_compression import get_compressor
+from baselines.common.mpi_hierarchical import get_comm
 
 class MpiAdam(object):
-    def __init__(self, var_list, *, beta1=0.9, beta2=0.999, epsilon=1e-08, scale_grad_by_procs=True, comm=None):
+    def __init__(self, var_list, *, beta1=0.9, beta2=0.999, epsilon=1e-08, scale_grad_by_procs=True, comm=None,
+                 host_params=False, check_synced_every=100, compression=None, topk_ratio=0.01):
         self.var_list = var_list
         self.beta1 = beta1
         self.beta2 = beta2
@@ -16,14 +21,55 @@ class MpiAdam(object):
         self.t = 0
         self.setfromflat = U.SetFromFlat(var_list)
         self.getflat = U.GetFlat(var_list)
-        self.comm = MPI.COMM_WORLD if comm is None else comm
+        self.comm = get_comm() if comm is None else comm
+        # With host_params the parameters are kept in a host vector between updates instead of
+        # being read back with getflat() every step. Only valid if nothing else writes to var_list;
+        # otherwise call invalidate() after such writes.
+        self.host_params = host_params
+        self.theta = None
+        self._request = None
+        self.check_synced_every = check_synced_every # updates between sync checks, 0 disables them
+        # 'fp16' or 'topk' to compress the gradient exchange, see mpi_compression
+        self.compressor = get_compressor(compression, comm=self.comm, ratio=topk_ratio,
+                                         name='adam_' + var_list[0].name.split('/')[0])
 
     def update(self, localg, stepsize):
-        if self.t % 100 == 0:
+        if self.check_synced_every and self.t % self.check_synced_every == 0:
             self.check_synced()
         localg = localg.astype('float32')
-        globalg = np.zeros_like(localg)
-        self.comm.Allreduce(localg, globalg, op=MPI.SUM)
+        with logger.profile('mpi_allreduce'):
+            if self.compressor is not None:
+                globalg = self.compressor.allreduce(localg)
+            else:
+                globalg = np.zeros_like(localg)
+                self.comm.Allreduce(localg, globalg, op=MPI.SUM)
+        self._apply(globalg, stepsize)
+
+    def start_update(self, localg, stepsize):
+        """
+        Start averaging localg across workers with a non-blocking Iallreduce, so that the transfer
+        overlaps with whatever runs until finish_update() applies the step.
+        """
+        assert self._request is None, 'finish_update() the pending update first'
+        if self.check_synced_every and self.t % self.check_synced_every == 0:
+            self.check_synced()
+        self._localg = localg.astype('float32')
+        self._globalg = np.zeros_like(self._localg)
+        self._stepsize = stepsize
+        if self.compressor is not None:
+            # compressed exchanges are blocking, nothing is left to overlap
+            self._globalg = self.compressor.allreduce(self._localg)
+            self._request = MPI.REQUEST_NULL
+        else:
+            self._request = self.comm.Iallreduce(self._localg, self._globalg, op=MPI.SUM)
+
+    def finish_update(self):
+        with logger.profile('mpi_wait'):
+            self._request.Wait()
+        self._request = None
+        self._apply(self._globalg, self._stepsize)
+
+    def _apply(self, globalg, stepsize):
         if self.scale_grad_by_procs:
             globalg /= self.comm.Get_size()
 
@@ -32,19 +78,53 @@ class MpiAdam(object):
         self.m = self.beta1 * self.m + (1 - self.beta1) * globalg
         self.v = self.beta2 * self.v + (1 - self.beta2) * (globalg * globalg)
         step = (- a) * self.m / (np.sqrt(self.v) + self.epsilon)
-        self.setfromflat(self.getflat() + step)
+        if self.host_params:
+            if self.theta is None:
+                self.theta = self.getflat()
+            theta = self.theta
+        else:
+            theta = self.getflat()
+        theta += step
+        self.setfromflat(theta)
+
+    @property
+    def pending(self):
+        return self._request is not None
+
+    def invalidate(self):
+        # the variables were written elsewhere, re-read them on the next update
+        assert not self.pending, 'finish_update() the pending update first'
+        self.theta = None
 
     def sync(self):
+        # a pending step would be applied on top of the broadcast parameters
+        assert not self.pending, 'finish_update() the pending update first'
         theta = self.getflat()
         self.comm.Bcast(theta, root=0)
         self.setfromflat(theta)
+        if self.host_params:
+            self.theta = theta
 
     def check_synced(self):
-        if self.comm.Get_rank() == 0: # this is root
+        assert not self.pending, 'finish_update() the pending update first'
+        # Agree on a checksum of the parameters first; only broadcast the full vector on a mismatch.
+        # A valid host vector mirrors the variables, so there is nothing to read back.
+        theta = self.theta if self.host_params and self.theta is not None else self.getflat()
+        checksum = zlib.crc32(theta.tobytes())
+        bounds = np.array([checksum, -checksum], 'int64')
+        globalbounds = np.zeros_like(bounds)
+        self.comm.Allreduce(bounds, globalbounds, op=MPI.MAX)
+        if globalbounds[0] != -globalbounds[1]:
+            logger.profile_count('mpi_adam_full_sync_check')
+            self.check_synced_full(theta)
+
+    def check_synced_full(self, theta=None):
+        if theta is None:
             theta = self.getflat()
+        if self.comm.Get_rank() == 0: # this is root
             self.comm.Bcast(theta, root=0)
         else:
-            thetalocal = self.getflat()
+            thetalocal = theta
             thetaroot = np.empty_like(thetalocal)
             self.comm.Bcast(thetaroot, root=0)
             assert (thetaroot == thetalocal).all(), (thetaroot, thetalocal)
@@ -76,4 +156,32 @@ def test_MpiAdam():
     for i in range(10):
         l,g = lossandgrad()
         adam.update(g, stepsize)
-        print(i,l)
\ No newline at end of file
+        print(i,l)
+
+@U.in_session
+def test_MpiAdam_overlapped():
+    np.random.seed(0)
+    a = tf.Variable(np.random.randn(3).astype('float32'))
+    b = tf.Variable(np.random.randn(2,5).astype('float32'))
+    loss = tf.reduce_sum(tf.square(a)) + tf.reduce_sum(tf.sin(b))
+    var_list = [a,b]
+    lossandgrad = U.function([], [loss, U.flatgrad(loss, var_list)])
+    getflat = U.GetFlat(var_list)
+    setfromflat = U.SetFromFlat(var_list)
+    tf.get_default_session().run(tf.global_variables_initializer())
+    theta0 = getflat()
+
+    blocking = MpiAdam(var_list)
+    for i in range(10):
+        _,g = lossandgrad()
+        blocking.update(g, 1e-2)
+    theta_blocking = getflat()
+
+    setfromflat(theta0)
+    overlapped = MpiAdam(var_list, host_params=True)
+    overlapped.sync()
+    for i in range(10):
+        _,g = lossandgrad()
+        overlapped.start_update(g, 1e-2)
+        overlapped.finish_update()
+    assert np.allclose(theta_blocking, getflat())
\ No newline at end of file
@@ -0,0 +1,117 @@
+"""
+Compressed allreduce for gradient and statistics exchange between MPI workers.
+
+    comp = get_compressor('fp16')         # or 'topk', None for plain float32
+    globalsum = comp.allreduce(localx)    # same shape/result contract as comm.Allreduce(..., op=MPI.SUM)
+
+fp16: values are scaled by the global max magnitude and summed as float16 (2 bytes per entry).
+topk: only the k = ratio * size largest-magnitude entries are exchanged (index + value, 8 bytes per
+      entry), the rest is kept in a local residual and added back on the next call (error feedback).
+      This only makes sense for a stream that reduces the same quantity (e.g. one gradient) every
+      call, so get_compressor(..., grad=False) falls back to fp16 for it.
+
+Each compressor logs the total bytes it has sent so far under comm/<name>_bytes, so the value
+dumped each iteration covers every call, however many there were.
+"""
+from mpi4py import MPI
+import numpy as np
+from baselines import logger
+from baselines.common.mpi_hierarchical import get_comm
+
+def get_compressor(kind, comm=None, name=None, grad=True, ratio=0.01):
+    if kind is None or kind == 'none':
+        return None
+    if kind == 'topk' and not grad:
+        kind = 'fp16'
+    name = name or kind
+    if kind == 'fp16':
+        return Float16Compression(comm=comm, name=name)
+    elif kind == 'topk':
+        return TopKCompression(comm=comm, name=name, ratio=ratio)
+    else:
+        raise ValueError('unknown compression %s' % kind)
+
+class Compression(object):
+    stateful = False # True if the result of a call depends on the previous calls
+
+    def __init__(self, comm=None, name='none'):
+        self.comm = get_comm() if comm is None else comm
+        self.name = name
+        self.nbytes = 0 # total bytes sent by this worker
+
+    def allreduce(self, x):
+        """Sum of x over all workers, as float32"""
+        x = np.asarray(x, 'float32')
+        out, nbytes = self._allreduce(x)
+        self.nbytes += nbytes
+        logger.logkv('comm/%s_bytes' % self.name, self.nbytes)
+        return out
+
+    def _allreduce(self, x):
+        out = np.zeros_like(x)
+        self.comm.Allreduce(x, out, op=MPI.SUM)
+        return out, x.nbytes
+
+def _float16_sum(inbuf, outbuf, datatype):
+    out = np.frombuffer(outbuf, 'float16')
+    out += np.frombuffer(inbuf, 'float16')
+
+_FLOAT16_SUM = None
+
+class Float16Compression(Compression):
+    def _allreduce(self, x):
+        global _FLOAT16_SUM
+        if _FLOAT16_SUM is None:
+            _FLOAT16_SUM = MPI.Op.Create(_float16_sum, commute=True)
+        # a shared scale keeps the float16 sum of all workers in [-size, size]
+        localmax = np.array([np.abs(x).max() if x.size else 0.], 'float32')
+        scale = np.zeros_like(localmax)
+        self.comm.Allreduce(localmax, scale, op=MPI.MAX)
+        scale = scale[0] if scale[0] > 0 else 1.
+        local16 = (x / scale).astype('float16')
+        global16 = np.zeros_like(local16)
+        # reduce as 2-byte integers so that MPI never splits a float16 in two
+        self.comm.Allreduce([local16.view('int16'), MPI.SHORT], [global16.view('int16'), MPI.SHORT], op=_FLOAT16_SUM)
+        return global16.astype('float32') * scale, local16.nbytes + localmax.nbytes
+
+class TopKCompression(Compression):
+    stateful = True
+
+    def __init__(self, comm=None, name='topk', ratio=0.01):
+        Compression.__init__(self, comm=comm, name=name)
+        assert 0 < ratio <= 1
+        self.ratio = ratio
+        self.residual = None
+
+    def _allreduce(self, x):
+        flat = x.ravel()
+        if self.residual is None:
+            self.residual = np.zeros_like(flat)
+        assert self.residual.shape == flat.shape, 'top-k error feedback needs the same vector size every call'
+        acc = flat + self.residual
+        k = max(1, int(self.ratio * acc.size))
+        idx = np.argpartition(np.abs(acc), acc.size - k)[acc.size - k:].astype('int32')
+        vals = acc[idx]
+        acc[idx] = 0
+        self.residual = acc
+
+        size = self.comm.Get_size()
+        allidx = np.zeros(size * k, 'int32')
+        allvals = np.zeros(size * k, 'float32')
+        self.comm.Allgather(idx, allidx)
+        self.comm.Allgather(vals, allvals)
+        out = np.zeros_like(flat)
+        np.add.at(out, allidx, allvals)
+        return out.reshape(x.shape), idx.nbytes + vals.nbytes
+
+def test_compression():
+    np.random.seed(0)
+    comm = MPI.COMM_SELF
+    x = np.random.randn(1000).astype('float32')
+    assert np.allclose(Compression(comm).allreduce(x), x)
+    assert np.allclose(Float16Compression(comm).allreduce(x), x, atol=1e-2)
+    # with error feedback every entry is eventually sent: sent + residual is the true running sum
+    topk = TopKCompression(comm, ratio=0.1)
+    sent = sum(topk.allreduce(x) for _ in range(50))
+    assert np.allclose(sent + topk.residual, 50 * x, atol=1e-3)
+    assert topk.nbytes == 50 * 100 * 8
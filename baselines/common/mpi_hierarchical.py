@@ -0,0 +1,77 @@
+"""
+Two-level reductions: first among the ranks of a node (shared memory), then among one leader
+rank per node over the network, then back to the node. get_comm() is what the MPI utilities
+(mpi_adam, mpi_moments, mpi_running_mean_std, mpi_compression) use in place of MPI.COMM_WORLD.
+
+Set BASELINES_MPI_HIERARCHICAL=0 to reduce over the flat COMM_WORLD instead.
+"""
+import os
+from mpi4py import MPI
+import numpy as np
+
+class HierarchicalComm(object):
+    """
+    Wraps an intracommunicator. Buffer Allreduce goes node-local Reduce -> leader Allreduce ->
+    node-local Bcast; everything else (Bcast, Iallreduce, Allgather, lowercase object methods, ...)
+    goes straight to the wrapped communicator, so ranks and roots keep their usual meaning.
+    """
+    def __init__(self, comm):
+        self.comm = comm
+        self.local = comm.Split_type(MPI.COMM_TYPE_SHARED, key=comm.Get_rank())
+        self.is_leader = self.local.Get_rank() == 0
+        self.leaders = comm.Split(0 if self.is_leader else MPI.UNDEFINED, key=comm.Get_rank())
+
+    def Allreduce(self, sendbuf, recvbuf, op=MPI.SUM):
+        assert sendbuf is not MPI.IN_PLACE
+        self.local.Reduce(sendbuf, recvbuf, op=op, root=0)
+        if self.is_leader:
+            self.leaders.Allreduce(MPI.IN_PLACE, recvbuf, op=op)
+        self.local.Bcast(recvbuf, root=0)
+
+    def __getattr__(self, name):
+        return getattr(self.comm, name)
+
+def split_by_node(comm):
+    """
+    HierarchicalComm over comm if it spans several nodes with several ranks on some node,
+    otherwise comm itself (a second level would only add latency).
+    """
+    if os.environ.get('BASELINES_MPI_HIERARCHICAL', '1') == '0' or comm.Get_size() == 1:
+        return comm
+    hcomm = HierarchicalComm(comm)
+    nleaders = comm.allreduce(int(hcomm.is_leader), op=MPI.SUM)
+    if nleaders == 1 or nleaders == comm.Get_size():
+        hcomm.local.Free()
+        if hcomm.is_leader:
+            hcomm.leaders.Free()
+        return comm
+    return hcomm
+
+_WORLD = None
+
+def get_comm():
+    """
+    COMM_WORLD, split by node on first use. Collective the first time it is called.
+    """
+    global _WORLD
+    if _WORLD is None:
+        _WORLD = split_by_node(MPI.COMM_WORLD)
+    return _WORLD
+
+def test_hierarchical():
+    import subprocess
+    subprocess.check_call(['mpirun', '-np', '4',
+        'python', '-c',
+        'from baselines.common.mpi_hierarchical import _helper_hierarchical; _helper_hierarchical()'])
+
+def _helper_hierarchical():
+    comm = MPI.COMM_WORLD
+    hcomm = HierarchicalComm(comm) # forced, all ranks of the test usually share one node
+    np.random.seed(comm.Get_rank())
+    x = np.random.randn(5, 3)
+    for op in [MPI.SUM, MPI.MAX]:
+        flat, hier = np.zeros_like(x), np.zeros_like(x)
+        comm.Allreduce(x, flat, op=op)
+        hcomm.Allreduce(x, hier, op=op)
+        assert np.allclose(flat, hier)
+    assert hcomm.Get_size() == comm.Get_size() and hcomm.Get_rank() == comm.Get_rank()
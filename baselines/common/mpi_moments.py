@@ -1,13 +1,21 @@
 from mpi4py import MPI
 import numpy as np
 from baselines.common import zipsame
+from baselines.common.mpi_hierarchical import get_comm
 
-def mpi_mean(x, axis=0, comm=None, keepdims=False):
+def mpi_mean(x, axis=0, comm=None, keepdims=False, compressor=None):
     x = np.asarray(x)
     assert x.ndim > 0
-    if comm is None: comm = MPI.COMM_WORLD
+    if comm is None: comm = get_comm()
     xsum = x.sum(axis=axis, keepdims=keepdims)
     n = xsum.size
+    if compressor is not None:
+        # Only the sums are compressed, the count is reduced exactly. mpi_moments reduces two
+        # different quantities through the same compressor, so it must not carry state between calls.
+        assert not compressor.stateful, 'statistics need a stateless compressor such as fp16'
+        assert compressor.comm == comm, 'compressor reduces over a different communicator'
+        count = comm.allreduce(x.shape[axis], op=MPI.SUM)
+        return compressor.allreduce(xsum) / count, count
     localsum = np.zeros(n+1, x.dtype)
     localsum[:n] = xsum.ravel()
     localsum[n] = x.shape[axis]
@@ -15,12 +23,12 @@ def mpi_mean(x, axis=0, comm=None, keepdims=False):
     comm.Allreduce(localsum, globalsum, op=MPI.SUM)
     return globalsum[:n].reshape(xsum.shape) / globalsum[n], globalsum[n]
 
-def mpi_moments(x, axis=0, comm=None, keepdims=False):
+def mpi_moments(x, axis=0, comm=None, keepdims=False, compressor=None):
     x = np.asarray(x)
     assert x.ndim > 0
-    mean, count = mpi_mean(x, axis=axis, comm=comm, keepdims=True)
+    mean, count = mpi_mean(x, axis=axis, comm=comm, keepdims=True, compressor=compressor)
     sqdiffs = np.square(x - mean)
-    meansqdiff, count1 = mpi_mean(sqdiffs, axis=axis, comm=comm, keepdims=True)
+    meansqdiff, count1 = mpi_mean(sqdiffs, axis=axis, comm=comm, keepdims=True, compressor=compressor)
     assert count1 == count
     std = np.sqrt(meansqdiff)
     if not keepdims:
@@ -1,5 +1,6 @@
 from mpi4py import MPI
 import tensorflow as tf, baselines.common.tf_util as U, numpy as np
+from baselines.common.mpi_hierarchical import get_comm
 
 class RunningMeanStd(object):
     # https://en.wikipedia.org/wiki/Algorithms_for_calculating_variance#Parallel_algorithm
@@ -32,15 +33,34 @@ class RunningMeanStd(object):
             updates=[tf.assign_add(self._sum, newsum),
                      tf.assign_add(self._sumsq, newsumsq),
                      tf.assign_add(self._count, newcount)])
+        # local sums not yet reduced across workers: sum, sumsq, count
+        self._pending = np.zeros(int(np.prod(self.shape))*2+1, 'float64')
 
 
     def update(self, x):
+        self.accumulate(x)
+        self.flush()
+
+    def accumulate(self, x):
+        """
+        Add x to the local sums only; they reach the TF variables (and the other workers) on flush().
+        """
         x = x.astype('float64')
         n = int(np.prod(self.shape))
+        self._pending[0:n] += x.sum(axis=0).ravel()
+        self._pending[n:2*n] += np.square(x).sum(axis=0).ravel()
+        self._pending[2*n] += len(x)
+
+    def flush(self):
+        """
+        Reduce the accumulated sums across workers and add them to the running statistics.
+        Collective: every worker has to call it at the same point.
+        """
+        n = int(np.prod(self.shape))
         totalvec = np.zeros(n*2+1, 'float64')
-        addvec = np.concatenate([x.sum(axis=0).ravel(), np.square(x).sum(axis=0).ravel(), np.array([len(x)],dtype='float64')])
-        MPI.COMM_WORLD.Allreduce(addvec, totalvec, op=MPI.SUM)
+        get_comm().Allreduce(self._pending, totalvec, op=MPI.SUM)
         self.incfiltparams(totalvec[0:n].reshape(self.shape), totalvec[n:2*n].reshape(self.shape), totalvec[2*n])
+        self._pending[:] = 0
 
 @U.in_session
 def test_runningmeanstd():
@@ -61,6 +81,21 @@ def test_runningmeanstd():
 
         assert np.allclose(ms1, ms2)
 
+@U.in_session
+def test_runningmeanstd_accumulate():
+    x1, x2, x3 = np.random.randn(3,2), np.random.randn(4,2), np.random.randn(5,2)
+    rms = RunningMeanStd(epsilon=0.0, shape=(2,))
+    U.initialize()
+
+    x = np.concatenate([x1, x2, x3], axis=0)
+    rms.accumulate(x1)
+    rms.accumulate(x2)
+    rms.flush()
+    rms.accumulate(x3)
+    rms.flush()
+
+    assert np.allclose([x.mean(axis=0), x.std(axis=0)], [rms.mean.eval(), rms.std.eval()])
+
 @U.in_session
 def test_dist():
     np.random.seed(0)
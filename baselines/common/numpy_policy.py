@@ -0,0 +1,233 @@
+"""
+Trained MLP policies frozen into a single .npz file and evaluated with NumPy only, for serving
+actions without a TensorFlow graph and session.
+
+    export_ddpg(agent, 'actor.npz')             # DDPG Actor + Representation (+ obs_rms)
+    export_mlp_policy(pi, 'pi.npz')             # ppo1 or gail MlpPolicy (+ ob_rms, vpred)
+
+    policy = NumpyPolicy.load('pi.npz')         # no TensorFlow needed from here on
+    ac, vpred = policy.act(stochastic, ob)      # same as MlpPolicy.act
+    action, _ = policy.pi(obs)                  # same as DDPG.pi(obs, apply_noise=False, compute_Q=False)
+    actions = policy.step(obs_batch)            # batched
+
+The file holds the weights as float32 arrays and a JSON spec of the layers; it is loaded
+without pickle. Exporting needs TensorFlow and the default (or agent's) session.
+"""
+import json
+
+import numpy as np
+
+LAYER_NORM_EPSILON = 1e-12 # tf.contrib.layers.layer_norm
+
+class NumpyPolicy(object):
+    """
+    spec: {'obs': {'mean', 'std' (None without normalization), 'clip'} or None, 'pi': layers,
+    'vf': layers or None, 'pd': {'type', ...}} with layers a list of ['dense', W, b], ['layer_norm', gamma, beta], ['relu'] or ['tanh'],
+    where W, b, ... are keys of arrays. pd type is 'deterministic' (action clipped to 'low', 'high'),
+    'gaussian' ('logstd' key of a fixed logstd, or None if the pi output holds mean and logstd)
+    or 'categorical'.
+    """
+    def __init__(self, spec, arrays):
+        self.spec = spec
+        self.arrays = {k: np.ascontiguousarray(v, 'float32') for (k, v) in arrays.items()}
+        obs = spec['obs'] or {'mean': None, 'std': None, 'clip': None}
+        self.ob_mean = None if obs['mean'] is None else self.arrays[obs['mean']]
+        self.ob_scale = None if obs['std'] is None else 1. / self.arrays[obs['std']]
+        self.ob_clip = obs['clip']
+        self.pi_layers = self._layers(spec['pi'])
+        self.vf_layers = None if spec['vf'] is None else self._layers(spec['vf'])
+        self.pd = spec['pd']
+        if self.pd['type'] == 'gaussian' and self.pd['logstd'] is not None:
+            self.logstd = self.arrays[self.pd['logstd']].reshape(-1)
+        self.recurrent = False
+
+    def _layers(self, spec):
+        return [(layer[0],) + tuple(self.arrays[k] for k in layer[1:]) for layer in spec]
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            arrays = {k: data[k] for k in data.files if k != 'spec'}
+            spec = json.loads(str(data['spec']))
+        return cls(spec, arrays)
+
+    def save(self, path):
+        np.savez(path, spec=np.array(json.dumps(self.spec)), **self.arrays)
+
+    def _forward(self, x, layers):
+        for layer in layers:
+            kind = layer[0]
+            if kind == 'dense':
+                x = np.dot(x, layer[1])
+                x += layer[2]
+            elif kind == 'layer_norm':
+                x = x - x.mean(axis=-1, keepdims=True)
+                x /= np.sqrt(np.square(x).mean(axis=-1, keepdims=True) + LAYER_NORM_EPSILON)
+                x *= layer[1]
+                x += layer[2]
+            elif kind == 'relu':
+                np.maximum(x, 0, out=x)
+            elif kind == 'tanh':
+                np.tanh(x, out=x)
+            else:
+                raise ValueError('unknown layer %s' % kind)
+        return x
+
+    def normalize(self, obs):
+        obz = np.asarray(obs, 'float32')
+        if self.ob_mean is not None:
+            obz = (obz - self.ob_mean) * self.ob_scale
+        if self.ob_clip is not None:
+            obz = np.clip(obz, self.ob_clip[0], self.ob_clip[1])
+        return obz
+
+    def step(self, obs, stochastic=False, compute_vpred=False):
+        """
+        Actions for a batch of observations, and the value predictions if compute_vpred
+        """
+        obz = self.normalize(obs)
+        out = self._forward(obz, self.pi_layers)
+        pdtype = self.pd['type']
+        if pdtype == 'deterministic':
+            ac = np.clip(out, self.pd['low'], self.pd['high'])
+        elif pdtype == 'gaussian':
+            if self.pd['logstd'] is None:
+                mean, logstd = np.split(out, 2, axis=-1)
+            else:
+                mean, logstd = out, self.logstd
+            ac = mean + np.exp(logstd) * np.random.randn(*mean.shape).astype('float32') if stochastic else mean
+        elif pdtype == 'categorical':
+            if stochastic:
+                u = np.random.uniform(size=out.shape)
+                out = out - np.log(-np.log(u))
+            ac = np.argmax(out, axis=-1)
+        else:
+            raise ValueError('unknown pd %s' % pdtype)
+        if not compute_vpred:
+            return ac
+        assert self.vf_layers is not None, 'no value function in this policy'
+        return ac, self._forward(obz, self.vf_layers)[:, 0]
+
+    def act(self, stochastic, ob):
+        """Like ppo1/gail MlpPolicy.act: action and value prediction for one observation"""
+        ac, vpred = self.step(np.asarray(ob)[None], stochastic, compute_vpred=True)
+        return ac[0], vpred[0]
+
+    def pi(self, obs):
+        """Like DDPG.pi(obs, apply_noise=False, compute_Q=False): (action, None) for one observation"""
+        return self.step(np.asarray(obs)[None])[0], None
+
+# ================================================================
+# Exporters (TensorFlow)
+# ================================================================
+
+def _scope_vars(scope):
+    """Global variables under scope, by name relative to it and without the :0"""
+    import tensorflow as tf
+    prefix = scope + '/'
+    return {v.name[len(prefix):].split(':')[0]: v for v in tf.global_variables() if v.name.startswith(prefix)}
+
+class _Exporter(object):
+    def __init__(self, sess):
+        self.sess = sess
+        self.tensors = {}
+
+    def add(self, name, tensor):
+        self.tensors[name] = tensor
+        return name
+
+    def dense(self, vars, name, kernel='kernel', bias='bias'):
+        i = len(self.tensors)
+        return ['dense', self.add('W%i' % i, vars[name + '/' + kernel]), self.add('b%i' % i, vars[name + '/' + bias])]
+
+    def layer_norm(self, vars, name):
+        i = len(self.tensors)
+        return ['layer_norm', self.add('g%i' % i, vars[name + '/gamma']), self.add('beta%i' % i, vars[name + '/beta'])]
+
+    def obs(self, rms, clip):
+        if rms is None:
+            return {'mean': None, 'std': None, 'clip': list(clip)}
+        return {'mean': self.add('ob_mean', rms.mean), 'std': self.add('ob_std', rms.std), 'clip': list(clip)}
+
+    def policy(self, spec):
+        names = list(self.tensors.keys())
+        values = self.sess.run([self.tensors[k] for k in names])
+        return NumpyPolicy(spec, dict(zip(names, values)))
+
+def _representation_layers(exporter, repr):
+    # tf.layers.dense / layer_norm name repeated layers dense, dense_1, ... in one scope
+    vars = _scope_vars(repr.name)
+    layers = []
+    for i in range(2):
+        suffix = '_%i' % i if i else ''
+        layers.append(exporter.dense(vars, 'dense' + suffix))
+        if repr.layer_norm:
+            layers.append(exporter.layer_norm(vars, 'LayerNorm' + suffix))
+        layers.append(['relu'])
+    return layers
+
+def export_actor(actor, path=None, obs_rms=None, observation_range=(-5., 5.), action_range=(-1., 1.), sess=None):
+    """
+    NumpyPolicy of a ddpg.models.Actor (with its Representation) evaluated on observations
+    normalized with obs_rms and clipped to observation_range; saved to path if given.
+    """
+    import tensorflow as tf
+    exporter = _Exporter(sess or tf.get_default_session())
+    layers = _representation_layers(exporter, actor.repr)
+    layers += [exporter.dense(_scope_vars(actor.name), 'dense'), ['tanh']]
+    spec = {
+        'obs': exporter.obs(obs_rms, observation_range),
+        'pi': layers,
+        'vf': None,
+        'pd': {'type': 'deterministic', 'low': float(action_range[0]), 'high': float(action_range[1])},
+    }
+    policy = exporter.policy(spec)
+    if path is not None:
+        policy.save(path)
+    return policy
+
+def export_ddpg(agent, path=None):
+    """NumpyPolicy of the (unperturbed, noise-free) actor of a ddpg.ddpg.DDPG agent"""
+    return export_actor(agent.actor, path, obs_rms=agent.obs_rms, observation_range=agent.observation_range,
+                        action_range=agent.action_range, sess=agent.sess)
+
+def export_mlp_policy(policy, path=None, sess=None):
+    """
+    NumpyPolicy of a ppo1.mlp_policy.MlpPolicy or gail.mlp_policy.MlpPolicy (Box observations,
+    diagonal Gaussian or categorical actions); saved to path if given.
+    """
+    import tensorflow as tf
+    exporter = _Exporter(sess or tf.get_default_session())
+    vars = _scope_vars(policy.scope)
+    if 'pol/fc1/kernel' in vars or 'pol/final/kernel' in vars: # ppo1: tf.layers.dense in vf/ and pol/
+        names = {'vf': 'vf/fc%i', 'vffinal': 'vf/final', 'pol': 'pol/fc%i', 'polfinal': 'pol/final', 'logstd': 'pol/logstd'}
+        kernel, bias = 'kernel', 'bias'
+    else: # gail: acktr.utils.dense
+        names = {'vf': 'vffc%i', 'vffinal': 'vffinal', 'pol': 'polfc%i', 'polfinal': 'polfinal', 'logstd': 'logstd'}
+        kernel, bias = 'w', 'b'
+    def mlp(hidden, final):
+        layers = []
+        i = 1
+        while (hidden % i) + '/' + kernel in vars:
+            layers += [exporter.dense(vars, hidden % i, kernel, bias), ['tanh']]
+            i += 1
+        return layers + [exporter.dense(vars, final, kernel, bias)]
+
+    pdtype = type(policy.pdtype).__name__
+    if pdtype == 'DiagGaussianPdType':
+        logstd = names['logstd']
+        pd = {'type': 'gaussian', 'logstd': exporter.add('logstd', vars[logstd]) if logstd in vars else None}
+    elif pdtype == 'CategoricalPdType':
+        pd = {'type': 'categorical'}
+    else:
+        raise NotImplementedError('cannot export a policy with %s actions' % pdtype)
+    spec = {
+        'obs': exporter.obs(policy.ob_rms, (-5., 5.)),
+        'pi': mlp(names['pol'], names['polfinal']),
+        'vf': mlp(names['vf'], names['vffinal']),
+        'pd': pd,
+    }
+    numpy_policy = exporter.policy(spec)
+    if path is not None:
+        numpy_policy.save(path)
+    return numpy_policy
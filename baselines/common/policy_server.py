@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Serve one trained policy to many local clients over a Unix socket. Requests from all clients
+are collected into micro-batches: a batch is evaluated as soon as it holds max_batch
+observations or its oldest request has waited max_latency seconds.
+
+    python -m baselines.common.policy_server --socket /tmp/policy.sock --numpy pi.npz
+    python -m baselines.common.policy_server --socket /tmp/policy.sock --deepq model.pkl
+
+    client = PolicyClient('/tmp/policy.sock')
+    ac = client.act(ob)             # one observation
+    acs = client.step(obs)          # a batch
+    client.stats()                  # throughput, batch sizes, latency percentiles
+
+Messages are length-prefixed; observations and actions travel as .npy bytes (no pickle).
+"""
+import argparse
+import io
+import json
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from baselines import logger
+
+_HEADER = struct.Struct('!cI') # request type, payload size
+_ACT, _STATS = b'A', b'S'
+_OK, _ERROR = b'O', b'E'
+
+def _to_bytes(x):
+    buf = io.BytesIO()
+    np.save(buf, x, allow_pickle=False)
+    return buf.getvalue()
+
+def _from_bytes(data):
+    return np.load(io.BytesIO(data), allow_pickle=False)
+
+def _recv_exactly(sock, n):
+    chunks = []
+    while n > 0:
+        chunk = sock.recv(n)
+        if not chunk:
+            raise EOFError('connection closed')
+        chunks.append(chunk)
+        n -= len(chunk)
+    return b''.join(chunks)
+
+def _send_message(sock, kind, payload):
+    sock.sendall(_HEADER.pack(kind, len(payload)) + payload)
+
+def _recv_message(sock):
+    kind, size = _HEADER.unpack(_recv_exactly(sock, _HEADER.size))
+    return kind, _recv_exactly(sock, size)
+
+class _Request(object):
+    def __init__(self, obs):
+        self.obs = obs
+        self.tstart = time.time()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class PolicyServer(object):
+    """
+    make_policy() is called once, in the thread that evaluates the batches (TensorFlow default
+    sessions are per thread), and returns a function from a batch of observations to a batch
+    of actions.
+    """
+    def __init__(self, make_policy, socket_path, max_batch=64, max_latency=0.002, log_interval=10.,
+                 latency_window=10000):
+        self.make_policy = make_policy
+        self.socket_path = socket_path
+        self.max_batch = max_batch
+        self.max_latency = max_latency
+        self.log_interval = log_interval # seconds between logger dumps of the stats, 0 disables them
+        self.requests = queue.Queue()
+        self.latencies = deque(maxlen=latency_window) # seconds from request arrival to result
+        self.batch_sizes = deque(maxlen=latency_window)
+        self.nrequests = self.nobs = self.nbatches = 0
+        self.tstart = time.time()
+        self.server = None
+        self.ready = threading.Event()
+        self.stopped = threading.Event()
+        self.error = None # raised by make_policy
+
+    def serve_forever(self):
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        server = self
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                server._handle(self.request)
+        self.server = socketserver.ThreadingUnixStreamServer(self.socket_path, Handler)
+        self.server.daemon_threads = True
+        batcher = threading.Thread(target=self._batch_loop, daemon=True)
+        batcher.start()
+        self.ready.wait()
+        if self.error is not None:
+            self.server.server_close()
+            os.remove(self.socket_path)
+            raise self.error
+        logger.info('Serving policy on %s' % self.socket_path)
+        try:
+            self.server.serve_forever()
+        finally:
+            self.stopped.set()
+            self.server.server_close()
+            os.remove(self.socket_path)
+
+    def shutdown(self):
+        self.server.shutdown()
+
+    def _handle(self, sock):
+        while True:
+            try:
+                kind, payload = _recv_message(sock)
+            except EOFError:
+                return
+            if kind == _STATS:
+                _send_message(sock, _OK, json.dumps(self.stats()).encode())
+                continue
+            request = _Request(_from_bytes(payload))
+            self.requests.put(request)
+            request.done.wait()
+            if request.error is not None:
+                _send_message(sock, _ERROR, str(request.error).encode())
+            else:
+                _send_message(sock, _OK, _to_bytes(request.result))
+
+    def _next_batch(self):
+        """Requests for the next batch: at least one, until max_batch observations or max_latency"""
+        batch = [self.requests.get()]
+        nobs = len(batch[0].obs)
+        deadline = batch[0].tstart + self.max_latency
+        while nobs < self.max_batch:
+            timeout = deadline - time.time()
+            try:
+                request = self.requests.get(timeout=timeout) if timeout > 0 else self.requests.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(request)
+            nobs += len(request.obs)
+        return batch
+
+    def _batch_loop(self):
+        try:
+            policy = self.make_policy()
+        except Exception as e:
+            self.error = e
+            return
+        finally:
+            self.ready.set()
+        tlog = time.time()
+        while not self.stopped.is_set():
+            batch = self._next_batch()
+            try:
+                with logger.profile('policy_batch'):
+                    actions = policy(np.concatenate([request.obs for request in batch]))
+            except Exception as e: # reported to the clients of this batch
+                for request in batch:
+                    request.error = e
+                    request.done.set()
+                continue
+            start = 0
+            tdone = time.time()
+            for request in batch:
+                request.result = actions[start:start + len(request.obs)]
+                start += len(request.obs)
+                self.latencies.append(tdone - request.tstart)
+            self.batch_sizes.append(start)
+            self.nrequests += len(batch)
+            self.nobs += start
+            self.nbatches += 1
+            logger.profile_count('policy_obs', start)
+            for request in batch: # after the stats, so that clients see their own requests counted
+                request.done.set()
+            if self.log_interval and tdone - tlog >= self.log_interval:
+                for (k, v) in self.stats().items():
+                    logger.logkv(k, v)
+                logger.dumpkvs()
+                tlog = tdone
+
+    def stats(self):
+        latencies = np.array(list(self.latencies)) * 1000
+        stats = {
+            'requests': self.nrequests,
+            'observations': self.nobs,
+            'batches': self.nbatches,
+            'obs_per_sec': self.nobs / (time.time() - self.tstart),
+            'mean_batch': float(np.mean(list(self.batch_sizes))) if self.batch_sizes else 0.,
+        }
+        for p in [50, 90, 99]:
+            stats['latency_ms_p%i' % p] = float(np.percentile(latencies, p)) if len(latencies) else 0.
+        return stats
+
+class PolicyClient(object):
+    def __init__(self, socket_path):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(socket_path)
+
+    def _request(self, kind, payload):
+        _send_message(self.sock, kind, payload)
+        status, data = _recv_message(self.sock)
+        if status == _ERROR:
+            raise RuntimeError('policy server: %s' % data.decode())
+        return data
+
+    def step(self, obs):
+        """Actions for a batch of observations"""
+        return _from_bytes(self._request(_ACT, _to_bytes(np.asarray(obs))))
+
+    def act(self, ob):
+        """Action for one observation"""
+        return self.step(np.asarray(ob)[None])[0]
+
+    def stats(self):
+        return json.loads(self._request(_STATS, b'').decode())
+
+    def close(self):
+        self.sock.close()
+
+def numpy_policy_loader(path, stochastic=False):
+    def make_policy():
+        from baselines.common.numpy_policy import NumpyPolicy
+        policy = NumpyPolicy.load(path)
+        return lambda obs: policy.step(obs, stochastic=stochastic)
+    return make_policy
+
+def deepq_loader(path, stochastic=False):
+    def make_policy():
+        from baselines import deepq
+        act = deepq.load(path)
+        return lambda obs: act(obs, stochastic=stochastic)
+    return make_policy
+
+def test_policy_server():
+    import tempfile
+    path = os.path.join(tempfile.mkdtemp(), 'policy.sock')
+    server = PolicyServer(lambda: lambda obs: obs.sum(axis=1), path, max_batch=8, max_latency=0.01, log_interval=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.ready.wait()
+    results = {}
+    def client(i):
+        c = PolicyClient(path)
+        results[i] = [c.act(np.full(3, i)) for _ in range(5)]
+        c.close()
+    clients = [threading.Thread(target=client, args=(i,)) for i in range(4)]
+    for c in clients: c.start()
+    for c in clients: c.join()
+    assert all(results[i] == [3 * i] * 5 for i in range(4))
+    stats = PolicyClient(path).stats()
+    assert stats['requests'] == 20 and stats['observations'] == 20 and stats['batches'] <= 20
+    server.shutdown()
+    thread.join()
+
+def main():
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--socket', type=str, required=True)
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument('--numpy', type=str, help='policy exported with baselines.common.numpy_policy')
+    group.add_argument('--deepq', type=str, help='deepq model pickle (ActWrapper.save)')
+    parser.add_argument('--stochastic', action='store_true')
+    parser.add_argument('--max-batch', type=int, default=64)
+    parser.add_argument('--max-latency-ms', type=float, default=2.)
+    parser.add_argument('--log-interval', type=float, default=10.)
+    args = parser.parse_args()
+    if args.numpy is not None:
+        make_policy = numpy_policy_loader(args.numpy, args.stochastic)
+    else:
+        make_policy = deepq_loader(args.deepq, args.stochastic)
+    server = PolicyServer(make_policy, args.socket, max_batch=args.max_batch,
+                          max_latency=args.max_latency_ms / 1000, log_interval=args.log_interval)
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
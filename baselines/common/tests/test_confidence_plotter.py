@@ -0,0 +1,61 @@
+import os
+import os.path as osp
+import tempfile
+
+import numpy as np
+
+from baselines.confidence_plotter import _cache_file, get_data, load_runs
+
+
+def write_progress(rundir, rows, keys=('total/steps', 'rollout/return')):
+    os.makedirs(rundir, exist_ok=True)
+    with open(osp.join(rundir, 'progress.csv'), 'wt') as fh:
+        fh.write(','.join(keys) + '\n')
+        for row in rows:
+            fh.write(','.join(str(x) for x in row) + '\n')
+
+
+def test_load_runs():
+    maindir = tempfile.mkdtemp()
+    write_progress(maindir + '/a', [(1, 1.), (2, 2.)])
+    write_progress(maindir + '/b', [(1, 3.)])
+    write_progress(maindir + '/c', [(1,)], keys=('total/steps',))
+    rundirs = [maindir + '/a', maindir + '/b', maindir + '/c']
+    cache_dir = osp.join(tempfile.mkdtemp(), 'cache')
+
+    for _ in range(2): # parsed, then from the cache
+        runs = load_runs(rundirs, 'rollout/return', nprocs=1, cache_dir=cache_dir)
+        assert np.allclose(runs[0][0], [1, 2]) and np.allclose(runs[0][1], [1, 2])
+        assert np.allclose(runs[1][0], [1]) and np.allclose(runs[1][1], [3])
+        assert runs[2] is None
+        assert len(os.listdir(cache_dir)) == 3
+
+    # a rewritten log is parsed again
+    write_progress(maindir + '/b', [(1, 3.), (2, 4.)])
+    runs = load_runs(rundirs, 'rollout/return', nprocs=1, cache_dir=cache_dir)
+    assert np.allclose(runs[1][1], [3, 4])
+
+
+def test_cache_file():
+    rundir = osp.join(tempfile.mkdtemp(), 'run')
+    write_progress(rundir, [(1, 1.)])
+    key = _cache_file(rundir, 'rollout/return', '/cache')
+    assert osp.dirname(key) == '/cache'
+    assert _cache_file(rundir, 'rollout/return', '/cache') == key
+    assert _cache_file(rundir, 'other', '/cache') != key
+    write_progress(rundir, [(1, 1.), (2, 2.)])
+    assert _cache_file(rundir, 'rollout/return', '/cache') != key
+
+
+def test_get_data_skips_hidden():
+    maindir = tempfile.mkdtemp()
+    write_progress(maindir + '/run_caus_0', [(1, 1.), (2, 2.)])
+    write_progress(maindir + '/.caus_cache', [(1, 5.)])
+    steps, data = get_data(maindir, 'caus', 'rollout/return', nprocs=1)
+    assert np.allclose(steps, [1, 2]) and len(data) == 1
+
+
+if __name__ == '__main__':
+    test_load_runs()
+    test_cache_file()
+    test_get_data_skips_hidden()
@@ -0,0 +1,9 @@
+from baselines.bench.benchmark_imports import HEAVY, measure
+
+
+def test_lightweight_imports():
+    # tools that only read logs should start without tensorflow, gym or MPI
+    for module in ['baselines.logger', 'baselines.bench.results', 'baselines.bench']:
+        result, error = measure(module, repeats=1)
+        assert error is None, error
+        assert not set(result['heavy']) & set(HEAVY), (module, result['heavy'])
@@ -0,0 +1,128 @@
+import os.path as osp
+import tempfile
+import threading
+
+import numpy as np
+
+from baselines import logger
+from baselines.logger import (AsyncOutputFormat, CSVOutputFormat, ColumnOutputFormat, HumanOutputFormat,
+                              JSONOutputFormat, KVWriter, Profiler, read_csv, read_columns)
+
+
+def test_csv_new_keys():
+    fname = osp.join(tempfile.mkdtemp(), 'progress.csv')
+    fmt = CSVOutputFormat(fname)
+    fmt.writekvs({'a': 1, 'b': 2})
+    fmt.writekvs({'a': 3, 'c': 4})
+    fmt.writekvs({'b': 5})
+    fmt.close()
+
+    df = read_csv(fname)
+    assert list(df.columns) == ['a', 'b', 'c']
+    assert np.allclose(df['a'].values[:2], [1, 3]) and np.isnan(df['a'].values[2])
+    assert np.allclose(df['b'].values[[0, 2]], [2, 5])
+    assert np.allclose(df['c'].values[1], 4) and np.isnan(df['c'].values[0])
+
+
+def test_columns():
+    dir = tempfile.mkdtemp()
+    fmt = ColumnOutputFormat(dir)
+    fmt.writekvs({'a/b': 1, 's': 'text'})
+    fmt.writekvs({'a/b': 2, 'c': 3.5})
+    fmt.flush()
+    fmt.writekvs({'a/b': 3})
+    fmt.close()
+
+    cols = read_columns(dir)
+    assert set(cols.keys()) == {'a/b', 'c'}
+    assert isinstance(cols['a/b'], np.memmap) and np.allclose(cols['a/b'], [1, 2, 3])
+    assert np.allclose(cols['c'][1], 3.5) and np.isnan(cols['c'][[0, 2]]).all()
+    assert list(read_columns(dir, ['c', 'missing']).keys()) == ['c']
+
+
+def test_profiler():
+    prof = Profiler(enabled=True)
+    for _ in range(3):
+        with prof.timer('outer'):
+            with prof.timer('inner'):
+                pass
+    prof.count('steps', 2)
+    kvs = prof.getkvs()
+    assert kvs['prof/outer_n'] == 3 and kvs['prof/outer/inner_n'] == 3
+    assert kvs['prof/outer/inner_p99'] <= kvs['prof/outer_total']
+    assert kvs['count/steps'] == 2
+    assert prof.getkvs() == {}
+    with prof.timer('outer'):
+        prof.count('steps')
+    prof.clear()
+    assert prof.getkvs() == {}
+    assert Profiler(enabled=False).timer('x') is not None
+
+
+def write_all(fmt):
+    fmt.writekvs({'a': 1, 'b': 2.5})
+    fmt.writekvs({'a': 3, 'c': 'x'})
+    if isinstance(fmt, HumanOutputFormat) or isinstance(getattr(fmt, 'fmt', None), HumanOutputFormat):
+        fmt.writeseq(['hello', ' world'])
+
+
+def test_async_same_output():
+    for make in [CSVOutputFormat, JSONOutputFormat, HumanOutputFormat]:
+        dir = tempfile.mkdtemp()
+        sync, async_ = make(osp.join(dir, 'sync')), AsyncOutputFormat(make(osp.join(dir, 'async')))
+        write_all(sync)
+        write_all(async_)
+        sync.close()
+        async_.close()
+        with open(osp.join(dir, 'sync')) as f1, open(osp.join(dir, 'async')) as f2:
+            assert f1.read() == f2.read()
+
+
+class RecordingFormat(KVWriter):
+    def __init__(self):
+        self.threads = []
+        self.flushes = 0
+        self.closed = False
+
+    def writekvs(self, kvs):
+        self.threads.append(threading.current_thread())
+
+    def flush(self):
+        self.flushes += 1
+
+    def close(self):
+        self.closed = True
+
+
+def test_async_flush_and_drain():
+    fmt = RecordingFormat()
+    async_ = AsyncOutputFormat(fmt, flush_interval=60.)
+    assert fmt.autoflush is False
+    async_.writekvs({'a': 1})
+    async_.flush()
+    # written from the writer thread, and flushed before flush() returned
+    assert fmt.threads == [async_.thread] and fmt.threads[0] is not threading.current_thread()
+    assert fmt.flushes == 1
+    async_.writekvs({'a': 2})
+    # what runs at exit for formats that were never closed
+    logger._drain_async_formats()
+    assert len(fmt.threads) == 2 and fmt.closed
+    assert async_ not in AsyncOutputFormat._live
+
+
+def test_configure_async():
+    dirs = [tempfile.mkdtemp(), tempfile.mkdtemp()]
+    for (dir, async_writes) in zip(dirs, [False, True]):
+        logger.configure(dir=dir, format_strs=['stdout', 'csv', 'log'], async_writes=async_writes)
+        fmts = logger.Logger.CURRENT.output_formats
+        assert [isinstance(fmt, AsyncOutputFormat) for fmt in fmts] == [False, async_writes, async_writes]
+        for i in range(3):
+            logger.logkv('i', i)
+            logger.dumpkvs()
+        logger.reset()
+    for fname in ['progress.csv', 'log.txt']:
+        with open(osp.join(dirs[0], fname)) as f1, open(osp.join(dirs[1], fname)) as f2:
+            lines1, lines2 = f1.readlines(), f2.readlines()
+        if fname == 'log.txt': # starts with 'Logging to <dir>'
+            lines1, lines2 = lines1[1:], lines2[1:]
+        assert lines1 == lines2 and lines1
@@ -0,0 +1,54 @@
+import os.path as osp
+import tempfile
+
+import gym
+import numpy as np
+import tensorflow as tf
+
+from baselines.common.numpy_policy import NumpyPolicy, export_actor, export_mlp_policy
+from baselines.common import tf_util
+from baselines.common.tf_util import initialize, single_threaded_session
+
+
+def _check_mlp_policy(policy_cls, ac_space):
+    ob_space = gym.spaces.Box(low=-1., high=1., shape=(5,))
+    obs = np.random.randn(10, 5).astype('float32')
+    tf_util._PLACEHOLDER_CACHE.clear() # placeholders of the previous graph
+    with tf.Graph().as_default():
+        pi = policy_cls(name='pi', ob_space=ob_space, ac_space=ac_space, hid_size=16, num_hid_layers=2)
+        with single_threaded_session():
+            initialize()
+            pi.ob_rms.update(np.random.randn(100, 5))
+            path = osp.join(tempfile.mkdtemp(), 'pi.npz')
+            export_mlp_policy(pi, path)
+            expected = [pi.act(False, ob) for ob in obs]
+    policy = NumpyPolicy.load(path)
+    for ob, (ac, vpred) in zip(obs, expected):
+        nac, nvpred = policy.act(False, ob)
+        assert np.allclose(nac, ac, atol=1e-5) and np.allclose(nvpred, vpred, atol=1e-5)
+
+
+def test_ppo1_mlp_policy():
+    from baselines.ppo1.mlp_policy import MlpPolicy
+    _check_mlp_policy(MlpPolicy, gym.spaces.Box(low=-1., high=1., shape=(3,)))
+    _check_mlp_policy(MlpPolicy, gym.spaces.Discrete(4))
+
+
+def test_gail_mlp_policy():
+    from baselines.gail.mlp_policy import MlpPolicy
+    _check_mlp_policy(MlpPolicy, gym.spaces.Box(low=-1., high=1., shape=(3,)))
+
+
+def test_ddpg_actor():
+    from baselines.ddpg.models import Actor
+    obs = np.random.randn(10, 5).astype('float32')
+    with tf.Graph().as_default():
+        obs0 = tf.placeholder(tf.float32, (None, 5))
+        actor = Actor(3, layer_norm=True)
+        actor_tf = actor(tf.clip_by_value(obs0, -5., 5.))
+        with single_threaded_session() as sess:
+            initialize()
+            policy = export_actor(actor)
+            expected = sess.run(actor_tf, feed_dict={obs0: obs})
+    assert np.allclose(policy.step(obs), expected, atol=1e-5)
+    assert np.allclose(policy.pi(obs[0])[0], expected[0], atol=1e-5)
@@ -0,0 +1,69 @@
+import json
+import os.path as osp
+import tempfile
+
+import numpy as np
+
+from baselines.bench.results import ResultsLoader, load_results
+
+
+def append(fname, text):
+    with open(fname, 'at') as fh:
+        fh.write(text)
+
+
+def header(t_start):
+    return '#%s\nr,l,t\n' % json.dumps({'t_start': t_start, 'env_id': None})
+
+
+def assert_same(df1, df2):
+    assert len(df1) == len(df2)
+    for key in ['r', 'l', 't']:
+        assert np.allclose(df1[key].values, df2[key].values)
+
+
+def test_incremental():
+    dir = tempfile.mkdtemp()
+    f0, f1 = osp.join(dir, '0.monitor.csv'), osp.join(dir, '1.monitor.csv')
+    append(f0, header(100.) + '1.0,10,1.0\n2.0,20,3.0\n3.0,3')
+    append(f1, header(101.))
+    loader = ResultsLoader(dir)
+
+    # the partial last line is left for the next update
+    new = loader.update()
+    assert list(new.r) == [1., 2.]
+    assert_same(loader.load(), load_results(dir))
+
+    assert loader.update() is None
+
+    append(f0, '0,5.0\n')
+    append(f1, '4.0,40,0.5\n')
+    new = loader.update()
+    assert list(new.r) == [4., 3.] # sorted by absolute time: 101.5, 105
+    df = loader.load()
+    assert list(df.r) == [1., 2., 4., 3.]
+    assert_same(df, load_results(dir))
+
+    tail = loader.tail(poll_interval=0.01)
+    append(f1, '5.0,50,9.0\n')
+    assert list(next(tail).r) == [5.]
+    assert_same(loader.load(), load_results(dir))
+
+
+def test_rewritten_file():
+    dir = tempfile.mkdtemp()
+    fname = osp.join(dir, '0.monitor.csv')
+    append(fname, header(100.) + '1.0,10,1.0\n2.0,20,2.0\n')
+    loader = ResultsLoader(dir)
+    loader.update()
+    # a new run under the same name replaces the old rows
+    with open(fname, 'wt') as fh:
+        fh.write(header(200.) + '7.0,70,1.0\n')
+    df = loader.load()
+    assert list(df.r) == [7.]
+    assert_same(df, load_results(dir))
+
+
+if __name__ == '__main__':
+    test_incremental()
+    test_rewritten_file()
@@ -1,6 +1,7 @@
 # tests for tf_util
 import tensorflow as tf
 from baselines.common.tf_util import (
+    cached_graph,
     function,
     initialize,
     single_threaded_session
@@ -18,7 +19,23 @@ def test_function():
             initialize()
 
             assert lin(2) == 6
+            assert lin(x=3) == 9
             assert lin(2, 2) == 10
+            assert lin(x=2, y=3) == 12
+
+
+def test_updates():
+    with tf.Graph().as_default():
+        x = tf.placeholder(tf.int32, (), name="x")
+        v = tf.Variable(0)
+        add = function([x], [], updates=[tf.assign_add(v, x)])
+        get = function([], v)
+
+        with single_threaded_session():
+            initialize()
+            assert add(2) == []
+            add(x=3)
+            assert get() == 5
 
 
 def test_multikwargs():
@@ -33,9 +50,40 @@ def test_multikwargs():
             initialize()
             assert lin(2) == 6
             assert lin(2, 2) == 10
+            assert lin(2, **{"other/x": 3}) == 12
             expt_caught = False
 
 
+def test_cached_graph():
+    import tempfile
+    cache_dir = tempfile.mkdtemp()
+    def build():
+        x = tf.placeholder(tf.float32, (), name="x")
+        v = tf.Variable(2.)
+        return {'x': x, 'y': x * v, 'vars': [v]}
+
+    for _ in range(2): # built and saved, then imported
+        with tf.Graph().as_default():
+            g = cached_graph(build, {'test': 1}, cache_dir)
+            with single_threaded_session() as sess:
+                initialize()
+                assert sess.run(g['y'], feed_dict={g['x']: 3.}) == 6.
+                assert isinstance(g['vars'][0], tf.Variable)
+
+    def build(): # same config, edited source: built again, not imported
+        x = tf.placeholder(tf.float32, (), name="x")
+        v = tf.Variable(3.)
+        return {'x': x, 'y': x * v, 'vars': [v]}
+
+    with tf.Graph().as_default():
+        g = cached_graph(build, {'test': 1}, cache_dir)
+        with single_threaded_session() as sess:
+            initialize()
+            assert sess.run(g['y'], feed_dict={g['x']: 3.}) == 9.
+
+
 if __name__ == '__main__':
     test_function()
+    test_updates()
     test_multikwargs()
+    test_cached_graph()
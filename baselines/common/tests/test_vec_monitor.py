@@ -0,0 +1,81 @@
+import os.path as osp
+import tempfile
+
+import numpy as np
+
+from baselines.bench.results import load_results
+from baselines.common.vec_env import VecEnv
+from baselines.common.vec_env.vec_monitor import VecMonitor
+
+
+class ScriptedVecEnv(VecEnv):
+    """Replays fixed per-step rewards, dones and infos for all envs"""
+    def __init__(self, rews, dones, infos):
+        VecEnv.__init__(self, num_envs=len(rews[0]), observation_space=None, action_space=None)
+        self.rews, self.dones, self.infos = rews, dones, infos
+        self.t = 0
+
+    def reset(self):
+        return np.zeros(self.num_envs)
+
+    def step_async(self, actions):
+        pass
+
+    def step_wait(self):
+        t = self.t
+        self.t += 1
+        infos = [dict(info) for info in self.infos[t]]
+        return np.zeros(self.num_envs), np.array(self.rews[t]), np.array(self.dones[t]), infos
+
+    def close(self):
+        pass
+
+
+def run(venv, nsteps):
+    venv.reset()
+    episodes = []
+    for _ in range(nsteps):
+        _, _, _, infos = venv.step(None)
+        episodes.append([info.get('episode') for info in infos])
+    venv.close()
+    return episodes
+
+
+def test_episodes():
+    # env 0: episodes of length 2 and 1, env 1: one episode of length 3
+    rews = [[1., 2.], [3., 4.], [5., 6.]]
+    dones = [[False, False], [True, False], [True, True]]
+    infos = [[{}, {}]] * 3
+    fname = osp.join(tempfile.mkdtemp(), 'vec')
+    episodes = run(VecMonitor(ScriptedVecEnv(rews, dones, infos), filename=fname), 3)
+
+    assert episodes[0] == [None, None]
+    assert episodes[1][0]['r'] == 4. and episodes[1][0]['l'] == 2 and episodes[1][1] is None
+    assert episodes[2][0]['r'] == 5. and episodes[2][0]['l'] == 1
+    assert episodes[2][1]['r'] == 12. and episodes[2][1]['l'] == 3
+
+    df = load_results(osp.dirname(fname))
+    assert list(df.r) == [4., 5., 12.] and list(df.l) == [2, 1, 3]
+
+
+def test_raw_reward_and_real_done():
+    # clipped rewards and a lost life (done) that does not end the game (real_done)
+    rews = [[1.], [1.], [1.]]
+    dones = [[False], [True], [True]]
+    infos = [[{'raw_reward': 10., 'real_done': False}],
+             [{'raw_reward': 20., 'real_done': False}],
+             [{'raw_reward': 30., 'real_done': True}]]
+    venv = VecMonitor(ScriptedVecEnv(rews, dones, infos), reward_key='raw_reward', done_key='real_done')
+    episodes = run(venv, 3)
+    assert episodes[1] == [None]
+    assert episodes[2][0]['r'] == 60. and episodes[2][0]['l'] == 3
+
+    # without the keys every life counts as an episode with clipped rewards
+    episodes = run(VecMonitor(ScriptedVecEnv(rews, dones, infos)), 3)
+    assert episodes[1][0]['r'] == 2. and episodes[1][0]['l'] == 2
+    assert episodes[2][0]['r'] == 1. and episodes[2][0]['l'] == 1
+
+
+if __name__ == '__main__':
+    test_episodes()
+    test_raw_reward_and_real_done()
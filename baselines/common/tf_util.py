@@ -80,6 +80,199 @@ def initialize():
     tf.get_default_session().run(tf.variables_initializer(new_variables))
     ALREADY_INITIALIZED.update(new_variables)
 
+# ================================================================
+# Step tracing
+# ================================================================
+
+class SessionTracer(object):
+    """
+    Runs selected calls of sess.run with FULL_TRACE: the ncalls calls following a trigger,
+    where a trigger is the start-th call, every every-th call, signal signum, or trigger().
+    Each traced call leaves a Chrome trace (chrome://tracing) in logdir, and the time per op
+    summed over all traced calls is kept in op_summary.txt.
+    """
+    def __init__(self, sess, logdir, ncalls=1, every=0, start=None, signum=None):
+        self.sess = sess
+        self.logdir = logdir
+        self.ncalls = ncalls
+        self.every = every
+        self.start = start
+        self.calls = 0
+        self.pending = 0
+        self.ntraces = 0
+        self.op_stats = {} # (device, node name) -> [op type, total micros, count]
+        self._run = sess.run
+        sess.run = self.run
+        sess._baselines_tracer = self
+        if signum is not None:
+            import signal
+            signal.signal(signum, lambda *args: self.trigger())
+
+    def trigger(self, ncalls=None):
+        self.pending = ncalls or self.ncalls
+
+    def run(self, fetches, feed_dict=None, options=None, run_metadata=None):
+        self.calls += 1
+        if self.calls == self.start or (self.every and self.calls % self.every == 0):
+            self.trigger()
+        if not self.pending or options is not None or run_metadata is not None:
+            return self._run(fetches, feed_dict, options, run_metadata)
+        self.pending -= 1
+        run_metadata = tf.RunMetadata()
+        out = self._run(fetches, feed_dict, tf.RunOptions(trace_level=tf.RunOptions.FULL_TRACE), run_metadata)
+        self._save(run_metadata)
+        return out
+
+    def _save(self, run_metadata):
+        from tensorflow.python.client import timeline
+        os.makedirs(self.logdir, exist_ok=True)
+        fname = os.path.join(self.logdir, 'timeline_%05i.json' % self.ntraces)
+        with open(fname, 'wt') as fh:
+            fh.write(timeline.Timeline(run_metadata.step_stats).generate_chrome_trace_format())
+        self.ntraces += 1
+        for dev in run_metadata.step_stats.dev_stats:
+            for node in dev.node_stats:
+                label = node.timeline_label
+                optype = label.split(' = ', 1)[1].split('(')[0] if ' = ' in label else node.node_name
+                stats = self.op_stats.setdefault((dev.device, node.node_name), [optype, 0, 0])
+                stats[1] += node.all_end_rel_micros
+                stats[2] += 1
+        with open(os.path.join(self.logdir, 'op_summary.txt'), 'wt') as fh:
+            fh.write(self.summary())
+
+    def summary(self, top=None):
+        """
+        Table of the ops with the largest total time over all traced calls
+        """
+        total = sum(stats[1] for stats in self.op_stats.values()) or 1
+        rows = sorted(self.op_stats.items(), key=lambda item: -item[1][1])[:top]
+        lines = ['%d traced calls' % self.ntraces,
+                 '%10s %6s %6s  %-20s %-40s %s' % ('total ms', '%', 'count', 'op', 'node', 'device')]
+        for ((device, node), (optype, micros, count)) in rows:
+            lines.append('%10.3f %6.2f %6d  %-20s %-40s %s' % (micros / 1e3, 100. * micros / total, count, optype, node, device))
+        return '\n'.join(lines) + '\n'
+
+def trace_session(sess=None, logdir=None, ncalls=1, every=0, start=None, signum=None):
+    """
+    Install a SessionTracer on sess (default session by default), writing to <logdir>/tf_trace
+    (the logger dir by default)
+    """
+    if sess is None:
+        sess = tf.get_default_session()
+    if getattr(sess, '_baselines_tracer', None) is not None:
+        return sess._baselines_tracer
+    if logdir is None:
+        from baselines import logger
+        logdir = os.path.join(logger.get_dir() or '.', 'tf_trace')
+    return SessionTracer(sess, logdir, ncalls=ncalls, every=every, start=start, signum=signum)
+
+def maybe_trace_session(sess=None, logdir=None):
+    """
+    trace_session configured by OPENAI_TF_TRACE, e.g. OPENAI_TF_TRACE=start=500,ncalls=5,signal=1;
+    signal=1 traces the next ncalls calls whenever the process gets SIGUSR1. Does nothing if unset.
+    """
+    config = os.getenv('OPENAI_TF_TRACE')
+    if not config:
+        return None
+    kwargs = dict(item.split('=') for item in config.split(','))
+    import signal
+    return trace_session(sess, logdir,
+        ncalls=int(kwargs.get('ncalls', 1)),
+        every=int(kwargs.get('every', 0)),
+        start=int(kwargs['start']) if 'start' in kwargs else None,
+        signum=signal.SIGUSR1 if kwargs.get('signal', '0') == '1' else None)
+
+# ================================================================
+# Graph cache
+# ================================================================
+
+def _graph_element_names(elements):
+    if elements is None:
+        return None
+    if isinstance(elements, dict):
+        return {k: _graph_element_names(v) for (k, v) in elements.items()}
+    if isinstance(elements, (list, tuple)):
+        return [_graph_element_names(v) for v in elements]
+    return elements.name
+
+def _graph_elements(names, graph, variables):
+    if names is None:
+        return None
+    if isinstance(names, dict):
+        return {k: _graph_elements(v, graph, variables) for (k, v) in names.items()}
+    if isinstance(names, list):
+        return [_graph_elements(v, graph, variables) for v in names]
+    return variables[names] if names in variables else graph.as_graph_element(names)
+
+def _source_hash(objs):
+    # source of the functions, classes and modules that build a graph, or their whole file
+    import hashlib
+    import inspect
+    h = hashlib.sha1()
+    for obj in objs:
+        try:
+            src = inspect.getsource(obj)
+        except (OSError, TypeError):
+            try:
+                with open(inspect.getfile(obj)) as fh:
+                    src = fh.read()
+            except (OSError, TypeError):
+                src = repr(obj)
+        h.update(src.encode())
+    return h.hexdigest()
+
+def cached_graph(build, config, cache_dir=None, sources=()):
+    """
+    Run build() in the default graph, or, if an earlier call with the same config saved one,
+    import its MetaGraph instead. build() returns the tensors, ops and variables the caller
+    needs (nested in dicts and lists); the same structure, with elements of the default graph,
+    is returned in both cases. Python objects created by build() do not exist after an import:
+    everything needed later has to be in the returned structure or in graph collections.
+
+    config: JSON-serializable description of everything that changes the graph; the graph-level
+    seed and the TensorFlow version are added to it.
+    cache_dir: defaults to $BASELINES_GRAPH_CACHE; without either, build() is always run.
+    sources: functions, classes or modules build() calls into (policy class, optimizer module...);
+    their source code and that of build() is part of the key, so editing them invalidates the
+    cache.
+    """
+    import hashlib
+    import json
+    import time
+    from baselines import logger
+    cache_dir = cache_dir or os.getenv('BASELINES_GRAPH_CACHE')
+    if not cache_dir:
+        return build()
+    graph = tf.get_default_graph()
+    config = dict(config, graph_seed=graph.seed, tf_version=tf.__version__,
+                  source=_source_hash([build] + list(sources)))
+    key = hashlib.sha1(json.dumps(config, sort_keys=True, default=repr).encode()).hexdigest()
+    path = os.path.join(cache_dir, key)
+    if os.path.exists(path + '.json'):
+        tstart = time.time()
+        with open(path + '.json') as fh:
+            index = json.load(fh)
+        tf.train.import_meta_graph(path + '.meta')
+        variables = {v.name: v for v in graph.get_collection(tf.GraphKeys.GLOBAL_VARIABLES)}
+        elements = _graph_elements(index['elements'], graph, variables)
+        elapsed = time.time() - tstart
+        logger.info('Imported graph %s in %.2fs instead of building it in %.2fs (%.2fs saved)'
+                    % (key, elapsed, index['build_seconds'], index['build_seconds'] - elapsed))
+        return elements
+    tstart = time.time()
+    elements = build()
+    build_seconds = time.time() - tstart
+    os.makedirs(cache_dir, exist_ok=True)
+    # written under temporary names and renamed, so that concurrent launches never see a partial entry
+    tmp = '%s.%i' % (path, os.getpid())
+    tf.train.export_meta_graph(tmp + '.meta')
+    with open(tmp + '.json', 'w') as fh:
+        json.dump({'config': config, 'build_seconds': build_seconds, 'elements': _graph_element_names(elements)}, fh)
+    os.replace(tmp + '.meta', path + '.meta')
+    os.replace(tmp + '.json', path + '.json')
+    logger.info('Built graph %s in %.2fs, saved to %s' % (key, build_seconds, cache_dir))
+    return elements
+
 # ================================================================
 # Model components
 # ================================================================
@@ -171,9 +364,12 @@ class _Function(object):
             if not hasattr(inpt, 'make_feed_dict') and not (type(inpt) is tf.Tensor and len(inpt.op.inputs) == 0):
                 assert False, "inputs should all be placeholders, constants, or have a make_feed_dict method"
         self.inputs = inputs
+        self.input_names = {_input_name(inpt): inpt for inpt in inputs}
         updates = updates or []
         self.update_group = tf.group(*updates)
-        self.outputs_update = list(outputs) + [self.update_group]
+        self.outputs = list(outputs)
+        # no update group to run (and no trailing None to strip) for plain functions
+        self.outputs_update = self.outputs + [self.update_group] if updates else self.outputs
         self.givens = {} if givens is None else givens
 
     def _feed_input(self, feed_dict, inpt, value):
@@ -182,18 +378,24 @@ class _Function(object):
         else:
             feed_dict[inpt] = value
 
-    def __call__(self, *args):
+    def __call__(self, *args, **kwargs):
         assert len(args) <= len(self.inputs), "Too many arguments provided"
         feed_dict = {}
         # Update the args
         for inpt, value in zip(self.inputs, args):
             self._feed_input(feed_dict, inpt, value)
+        for name, value in kwargs.items():
+            self._feed_input(feed_dict, self.input_names[name], value)
         # Update feed dict with givens.
         for inpt in self.givens:
             feed_dict[inpt] = feed_dict.get(inpt, self.givens[inpt])
-        results = tf.get_default_session().run(self.outputs_update, feed_dict=feed_dict)[:-1]
+        results = tf.get_default_session().run(self.outputs_update, feed_dict=feed_dict)[:len(self.outputs)]
         return results
 
+def _input_name(inpt):
+    # placeholder.op.name, or the name of a TfInput-like object
+    return inpt.op.name if isinstance(inpt, tf.Tensor) else getattr(inpt, 'name', None)
+
 # ================================================================
 # Flat vectors
 # ================================================================
@@ -0,0 +1,69 @@
+import time
+import json
+import numpy as np
+from baselines.bench.results import EXT
+from . import VecEnvWrapper
+
+class VecMonitor(VecEnvWrapper):
+    """
+    Episode returns and lengths of all envs, tracked in the parent process. Finished episodes
+    are written to a single monitor file (same format as bench.Monitor, so load_results reads it)
+    and attached as info['episode'].
+
+    reward_key / done_key: info entries to use instead of the vectorized rewards / dones when the
+    env wrappers change them, e.g. 'raw_reward' (ClipRewardEnv) and 'real_done' (EpisodicLifeEnv)
+    to count whole Atari games with unclipped scores.
+    """
+    def __init__(self, venv, filename=None, reward_key=None, done_key=None, flush_interval=5.):
+        VecEnvWrapper.__init__(self, venv)
+        self.tstart = time.time()
+        self.reward_key = reward_key
+        self.done_key = done_key
+        self.eprets = np.zeros(self.num_envs, 'float64')
+        self.eplens = np.zeros(self.num_envs, 'int64')
+        self.flush_interval = flush_interval
+        self.tflush = self.tstart
+        if filename is None:
+            self.f = None
+        else:
+            if not filename.endswith(EXT):
+                filename = filename + "." + EXT
+            self.f = open(filename, "wt")
+            self.f.write('#%s\n'%json.dumps({"t_start": self.tstart, 'env_id': None, 'num_envs': self.num_envs}))
+            self.f.write('r,l,t\n')
+
+    def reset(self):
+        obs = self.venv.reset()
+        self.eprets[:] = 0
+        self.eplens[:] = 0
+        return obs
+
+    def step_wait(self):
+        obs, rews, dones, infos = self.venv.step_wait()
+        # the learner still gets rews and dones unchanged
+        eprews, epdones = rews, dones
+        if self.reward_key is not None:
+            eprews = np.array([info.get(self.reward_key, r) for (info, r) in zip(infos, rews)])
+        if self.done_key is not None:
+            epdones = np.array([info.get(self.done_key, d) for (info, d) in zip(infos, dones)])
+        self.eprets += eprews
+        self.eplens += 1
+        lines = []
+        for i in np.flatnonzero(epdones):
+            epinfo = {'r': round(float(self.eprets[i]), 6), 'l': int(self.eplens[i]), 't': round(time.time() - self.tstart, 6)}
+            infos[i]['episode'] = epinfo
+            lines.append('%r,%d,%r\n' % (epinfo['r'], epinfo['l'], epinfo['t']))
+            self.eprets[i] = 0
+            self.eplens[i] = 0
+        if self.f is not None and lines:
+            self.f.write(''.join(lines))
+            if time.time() - self.tflush >= self.flush_interval:
+                self.f.flush()
+                self.tflush = time.time()
+        return obs, rews, dones, infos
+
+    def close(self):
+        if self.f is not None:
+            self.f.close()
+            self.f = None
+        return self.venv.close()
@@ -10,7 +10,8 @@ import numpy as np
 import scipy.stats
 import os
 
-from baselines.bench.monitor import load_results
+from baselines.bench.results import load_results
+from baselines.logger import read_csv, read_columns
     
 X_TIMESTEPS = 'timesteps'
 X_EPISODES = 'episodes'
@@ -23,67 +24,99 @@ COLORS = ['black', 'blue','red','lime', 'cyan', 'orange', 'teal', 'green', 'dark
         'tan', 'salmon', 'gold', 'lightpurple', 'darkred', 'darkblue']
 
 def mean_confidence_interval(data, confidence=0.68):
-    a = 1.0*np.array(data)
-    n = len(a)
-    m, se = np.mean(a,axis=0), scipy.stats.sem(a)
-    h = se * scipy.stats.t.ppf((1+confidence)/2., n-1)
+    """
+    Mean and t confidence interval at every index, over runs of possibly unequal length:
+    each index uses only the runs that reached it.
+    """
+    maxlen = max(len(run) for run in data)
+    a = np.full((len(data), maxlen), np.nan)
+    for (i, run) in enumerate(data):
+        a[i, :len(run)] = run
+    n = np.sum(~np.isnan(a), axis=0)
+    m = np.nanmean(a, axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        se = np.nanstd(a, axis=0, ddof=1) / np.sqrt(n)
+        h = se * scipy.stats.t.ppf((1+confidence)/2., n-1)
     return m, m-h, m+h
 
-def get_data(maindir, keyword, data_name):
-    # read maindir and get a list of all runs with keyword
-    fulldirlist = os.listdir(maindir) 
-    rewards_list = []
-    for datadir in fulldirlist:
-        if keyword in datadir: 
-            print(datadir)
-            csvpath = maindir+"/"+datadir+"/progress.csv"
-            with open(csvpath) as f:
-                reader = csv.reader(f)
-                labels = next(reader)
-                steps = []
-                rewards = []
-                for ind in range(len(labels)):
-                    if labels[ind] == 'total/steps':
-                        stepsind = ind
-                        print("ind:{} -- label:{}".format(ind, labels[ind]))
-                        f.seek(0)
-                        for row in reader:
-                            steps.append(row[stepsind])
-                        steps = steps[1:]
-                            
-                            
-                    if labels[ind] == data_name:
-                        rewardind = ind
-                        print("ind:{} -- label:{}".format(ind, labels[ind]))
-                        f.seek(0)
-                        for row in reader:
-                            rewards.append(row[rewardind])
-                        
-                        rewards = rewards[1:]
-                        for n,i in enumerate(rewards):
-                            if i=='':
-                                rewards[n] = float(0)
-                            else:
-                                rewards[n] = float(rewards[n])
-                        
-                        #rewards = list(map(float,rewards[1:]))
-                        print(len(rewards))
-                        rewards_list.append(np.array(rewards))
-    
-    rewards_length = [len(item) for item in rewards_list]
-    samelength = rewards_length[1:] == rewards_length[:-1]
-    if not samelength:
-        ValueError("Not all reward lists are equal")
-    return steps, rewards_list
+def _source_file(rundir):
+    if os.path.isdir(rundir+"/columns"):
+        return rundir+"/columns/index.json"
+    return rundir+"/progress.csv"
+
+def _parse_run(args):
+    rundir, data_name = args
+    if os.path.isdir(rundir+"/columns"):
+        # binary columns (logger format 'columns'), only the two needed keys are mapped
+        progress = read_columns(rundir, ['total/steps', data_name])
+    else:
+        progress = read_csv(rundir+"/progress.csv")
+    if data_name not in progress:
+        return None
+    steps = np.array(progress['total/steps'], dtype=float)
+    rewards = np.nan_to_num(np.array(progress[data_name], dtype=float))
+    return steps, rewards
+
+def _cache_file(rundir, data_name, cache_dir):
+    # keyed by the path, mtime and size of the run's log, so a rewritten log is parsed again
+    import hashlib
+    src = os.path.abspath(_source_file(rundir))
+    st = os.stat(src)
+    key = repr((src, st.st_mtime_ns, st.st_size, data_name)).encode()
+    return os.path.join(cache_dir, hashlib.sha1(key).hexdigest() + '.npz')
+
+def load_runs(rundirs, data_name, nprocs=None, cache_dir=None):
+    """
+    (steps, values) for every run in rundirs, None for runs that never logged data_name.
+    Runs are parsed in a process pool; with a cache_dir, parsed columns are stored there keyed
+    by file path, mtime and size, and reused until the run's log changes.
+    """
+    from multiprocessing import Pool
+    results = [None] * len(rundirs)
+    cachefiles = [None] * len(rundirs)
+    todo = []
+    for (i, rundir) in enumerate(rundirs):
+        if cache_dir is not None:
+            cachefiles[i] = _cache_file(rundir, data_name, cache_dir)
+            if os.path.exists(cachefiles[i]):
+                with np.load(cachefiles[i]) as cached:
+                    results[i] = (cached['steps'], cached['values']) if cached['found'] else None
+                continue
+        todo.append(i)
+    if todo:
+        args = [(rundirs[i], data_name) for i in todo]
+        if len(todo) > 1 and nprocs != 1:
+            with Pool(nprocs) as pool:
+                parsed = pool.map(_parse_run, args)
+        else:
+            parsed = [_parse_run(arg) for arg in args]
+        for (i, res) in zip(todo, parsed):
+            results[i] = res
+            if cache_dir is not None:
+                os.makedirs(cache_dir, exist_ok=True)
+                steps, values = res if res is not None else (np.zeros(0), np.zeros(0))
+                np.savez(cachefiles[i], steps=steps, values=values, found=res is not None)
+    return results
+
+def get_data(maindir, keyword, data_name, nprocs=None, cache_dir=None):
+    # read maindir and get a list of all runs with keyword, skipping hidden entries such as caches
+    rundirs = [maindir+"/"+datadir for datadir in sorted(os.listdir(maindir))
+               if keyword in datadir and not datadir.startswith('.')]
+    print('{} runs for {}'.format(len(rundirs), keyword))
+    runs = [run for run in load_runs(rundirs, data_name, nprocs=nprocs, cache_dir=cache_dir) if run is not None]
+    # the longest run provides the x axis, shorter runs only count where they have data
+    steps = max((steps for (steps, _) in runs), key=len)
+    return steps, [rewards for (_, rewards) in runs]
 
 
-def lineplotCIgroups(maindir, keywords, data_name='rollout/return_history', x_label='steps (thousands)', y_label='cumulative reward', title='no title'):
+def lineplotCIgroups(maindir, keywords, data_name='rollout/return_history', x_label='steps (thousands)', y_label='cumulative reward', title='no title',
+                     nprocs=None, cache_dir=None):
     # Create the plot object
     _, ax = plt.subplots()
     
     for ind,keyword in enumerate(keywords): 
         print('keyword: '+keyword)
-        indexes, data = get_data(maindir, keyword, data_name)
+        indexes, data = get_data(maindir, keyword, data_name, nprocs=nprocs, cache_dir=cache_dir)
         med,low,high = mean_confidence_interval(data)
         
         indexes = np.array(indexes).astype(float)/2000
@@ -114,9 +147,14 @@ def main():
     parser.add_argument('-x','--xaxis', help = 'Variable on X-axis', default = X_EPOCHS)
     parser.add_argument('-y','--yaxis', help = 'Variable on Y-axis', default = 'cumulative reward')
     parser.add_argument('-t','--title', help = 'Title of plot', default = None)
+    parser.add_argument('-j','--nprocs', help = 'Processes parsing runs (default: all cores)', type=int, default = None)
+    parser.add_argument('--cache-dir', help = 'Cache of parsed runs', default = os.path.expanduser('~/.cache/baselines_plots'))
+    parser.add_argument('--no-cache', action='store_true')
     args = parser.parse_args()
+    cache_dir = None if args.no_cache else args.cache_dir
     
-    lineplotCIgroups(args.maindir, args.keywords, args.data_name, x_label=args.xaxis, y_label=args.yaxis, title=args.title)
+    lineplotCIgroups(args.maindir, args.keywords, args.data_name, x_label=args.xaxis, y_label=args.yaxis, title=args.title,
+                     nprocs=args.nprocs, cache_dir=cache_dir)
     
     plt.show()
 
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Per-step overhead of the DDPG target network soft update and param noise perturbation:
+one assign per variable (get_target_updates / get_perturbed_actor_updates) vs. a single
+assign on a flat buffer (FlatCopy) vs. an in-place NumPy update of host-side parameters.
+"""
+import argparse
+import time
+from copy import copy, deepcopy
+
+import numpy as np
+import tensorflow as tf
+
+from baselines import logger
+import baselines.common.tf_util as U
+from baselines.ddpg.ddpg import FlatCopy, get_target_updates, get_perturbed_actor_updates, soft_update_host
+from baselines.ddpg.models import Actor, Critic
+
+
+def renamed(model, name, deep=True):
+    model = deepcopy(model) if deep else copy(model)
+    model.name = name
+    model.repr = deepcopy(model.repr)
+    model.repr.name = name + '_repr'
+    return model
+
+def timeit(f, nsteps):
+    f() # warm up
+    tstart = time.time()
+    for _ in range(nsteps):
+        f()
+    return (time.time() - tstart) / nsteps
+
+def main():
+    parser = argparse.ArgumentParser(formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--obs-dim', type=int, default=17)
+    parser.add_argument('--nb-actions', type=int, default=6)
+    parser.add_argument('--nsteps', type=int, default=1000)
+    parser.add_argument('--tau', type=float, default=0.01)
+    args = parser.parse_args()
+    logger.set_level(logger.WARN)
+
+    obs = tf.placeholder(tf.float32, shape=(None, args.obs_dim), name='obs0')
+    stddev = tf.placeholder(tf.float32, shape=(), name='param_noise_stddev')
+    actor = Actor(args.nb_actions, layer_norm=True)
+    critic = Critic(layer_norm=True)
+    targets = {}
+    for kind in ['vars', 'flat']:
+        target_actor = renamed(actor, kind + '_target_actor')
+        target_critic = renamed(critic, kind + '_target_critic')
+        perturbed_actor = renamed(actor, kind + '_perturbed_actor', deep=False)
+        targets[kind] = (target_actor, target_critic, perturbed_actor)
+    critic(obs, actor(obs))
+
+    # one assign per variable
+    target_actor, target_critic, perturbed_actor = targets['vars']
+    target_critic(obs, target_actor(obs))
+    perturbed_actor(obs)
+    _, actor_soft = get_target_updates(actor.vars, target_actor.vars, args.tau)
+    _, critic_soft = get_target_updates(critic.vars, target_critic.vars, args.tau)
+    vars_soft = tf.group(actor_soft, critic_soft)
+    vars_perturb = get_perturbed_actor_updates(actor, perturbed_actor, stddev)
+
+    # one assign per flat buffer
+    target_actor, target_critic, perturbed_actor = targets['flat']
+    flat_actor, flat_critic, flat_perturbed = FlatCopy(actor, target_actor), FlatCopy(critic, target_critic), FlatCopy(actor, perturbed_actor)
+    with flat_actor.scope(), flat_critic.scope(), flat_perturbed.scope():
+        target_critic(obs, target_actor(obs))
+        perturbed_actor(obs)
+    flat_soft = tf.group(flat_actor.soft_update(args.tau), flat_critic.soft_update(args.tau))
+    flat_perturb = flat_perturbed.perturb_update(actor.perturbable_vars, stddev)
+
+    nparams = flat_actor.size + flat_critic.size
+    host_target, host_source = np.zeros(nparams, 'float32'), np.random.randn(nparams).astype('float32')
+
+    with U.single_threaded_session() as sess:
+        sess.run(tf.global_variables_initializer())
+        feed = {stddev: 0.1}
+        rows = [
+            ('soft update, per-variable assigns', timeit(lambda: sess.run(vars_soft), args.nsteps)),
+            ('soft update, flat assign', timeit(lambda: sess.run(flat_soft), args.nsteps)),
+            ('soft update, host NumPy', timeit(lambda: soft_update_host(host_target, host_source, args.tau), args.nsteps)),
+            ('perturbation, per-variable assigns', timeit(lambda: sess.run(vars_perturb, feed_dict=feed), args.nsteps)),
+            ('perturbation, flat assign', timeit(lambda: sess.run(flat_perturb, feed_dict=feed), args.nsteps)),
+        ]
+    print('actor+critic params: {} ({} variables)'.format(nparams, len(flat_actor.vars) + len(flat_critic.vars)))
+    for name, dt in rows:
+        print('{:40s} {:10.1f} us/step'.format(name, dt * 1e6))
+
+
+if __name__ == '__main__':
+    main()
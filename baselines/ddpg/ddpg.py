@@ -1,5 +1,6 @@
 from copy import copy, deepcopy
 from functools import reduce
+import time
 
 import numpy as np
 import tensorflow as tf
@@ -59,6 +60,117 @@ def get_perturbed_actor_updates(actor, perturbed_actor, param_noise_stddev):
             updates.append(tf.assign(perturbed_var, var))
     assert len(updates) == len(actor.vars)
     return tf.group(*updates)
+
+class FlatCopy(object):
+    """
+    Keeps the variables of a copy of a model (target or perturbed network) in one flat variable.
+    The copy is built under scope(), where its layers read reshaped slices of that variable, so
+    syncing, soft-updating or perturbing the whole copy is a single assign.
+    """
+    def __init__(self, source, copy):
+        self.vars = []
+        for var in source.vars:
+            if var not in self.vars:
+                self.vars.append(var)
+        self.prefixes = [(copy.name + '_repr/', source.name + '_repr/'), (copy.name + '/', source.name + '/')]
+        self.slices = {}
+        start = 0
+        for var in self.vars:
+            self.slices[var.op.name] = (start, U.var_shape(var))
+            start += U.numel(var)
+        self.size = start
+        logger.info('  {} <- {} as flat vector of {} params'.format(copy.name, source.name, self.size))
+        with tf.variable_scope('flat'):
+            self.flat = tf.get_variable(copy.name, shape=[self.size], initializer=tf.zeros_initializer(), trainable=False)
+
+    def _getter(self, getter, name, *args, **kwargs):
+        for copy_prefix, source_prefix in self.prefixes:
+            if name.startswith(copy_prefix):
+                start, shape = self.slices[source_prefix + name[len(copy_prefix):]]
+                return tf.reshape(self.flat.read_value()[start:start + U.intprod(shape)], shape)
+        return getter(name, *args, **kwargs)
+
+    def source_flat(self):
+        # explicit reads, so that updates built inside tf.while_loop see the current values
+        return tf.concat(axis=0, values=[tf.reshape(var.read_value(), [-1]) for var in self.vars])
+
+    def scope(self):
+        return tf.variable_scope(tf.get_variable_scope(), custom_getter=self._getter)
+
+    def init_update(self):
+        return tf.assign(self.flat, self.source_flat())
+
+    def soft_update(self, tau):
+        return tf.assign(self.flat, (1. - tau) * self.flat.read_value() + tau * self.source_flat())
+
+    def perturb_update(self, perturbable_vars, param_noise_stddev):
+        mask = np.concatenate([np.full(U.numel(var), float(var in perturbable_vars), dtype='float32') for var in self.vars])
+        noise = tf.random_normal([self.size], mean=0., stddev=param_noise_stddev) * mask
+        return tf.assign(self.flat, self.source_flat() + noise)
+
+def soft_update_host(target, source, tau):
+    # in-place counterpart of FlatCopy.soft_update for parameter vectors kept in NumPy
+    target *= (1. - tau)
+    target += tau * source
+    return target
+
+def unflatten(flat, var_list):
+    # splits a flat vector (e.g. the output of U.flatgrad) back into tensors shaped like var_list
+    sizes = [U.numel(v) for v in var_list]
+    return [tf.reshape(t, U.var_shape(v)) for t, v in zip(tf.split(flat, sizes), var_list)]
+
+def unique(var_list):
+    # the model var lists can repeat representation variables
+    out = []
+    for var in var_list:
+        if var not in out:
+            out.append(var)
+    return out
+
+class LoopReads(object):
+    """
+    Custom getter that reads every variable once per tf.while_loop iteration. Plain ref variables
+    used inside a loop body would be read once, before the loop starts.
+    """
+    def __init__(self):
+        self.reads = {}
+
+    def __call__(self, getter, name, *args, **kwargs):
+        var = getter(name, *args, **kwargs)
+        if var not in self.reads:
+            self.reads[var] = var.read_value()
+        return self.reads[var]
+
+    def scope(self):
+        return tf.variable_scope(tf.get_variable_scope(), custom_getter=self)
+
+    def tensors(self, var_list):
+        return [self.reads.get(var, var) for var in var_list]
+
+class LoopAdam(object):
+    """
+    Adam on a flat gradient with its moments kept in flat variables, so that update() can be
+    built inside tf.while_loop. Same update rule as MpiAdam, without the MPI averaging.
+    """
+    def __init__(self, var_list, stepsize, name, beta1=0.9, beta2=0.999, epsilon=1e-08):
+        self.var_list = var_list
+        self.stepsize = stepsize
+        self.beta1 = beta1
+        self.beta2 = beta2
+        self.epsilon = epsilon
+        size = sum(U.numel(v) for v in var_list)
+        with tf.variable_scope('loop_adam/' + name):
+            self.m = tf.get_variable('m', shape=[size], initializer=tf.zeros_initializer(), trainable=False)
+            self.v = tf.get_variable('v', shape=[size], initializer=tf.zeros_initializer(), trainable=False)
+            self.t = tf.get_variable('t', shape=[], initializer=tf.zeros_initializer(), trainable=False)
+
+    def update(self, g):
+        t = tf.assign_add(self.t, 1.)
+        m = tf.assign(self.m, self.beta1 * self.m.read_value() + (1. - self.beta1) * g)
+        v = tf.assign(self.v, self.beta2 * self.v.read_value() + (1. - self.beta2) * tf.square(g))
+        a = self.stepsize * tf.sqrt(1. - self.beta2 ** t) / (1. - self.beta1 ** t)
+        step = (- a) * m / (tf.sqrt(v) + self.epsilon)
+        return tf.group(*[tf.assign_add(var, s) for var, s in zip(self.var_list, unflatten(step, self.var_list))])
     
 def magnitude(tensor, axis=1):
     # returns sum of squared values divided by length of tensor
@@ -85,7 +197,9 @@ class DDPG(object):
         batch_size=128, observation_range=(-5., 5.), action_range=(-1., 1.), return_range=(-np.inf, np.inf),
         adaptive_param_noise=True, adaptive_param_noise_policy_threshold=.1,
         critic_l2_reg=0., actor_lr=1e-4, critic_lr=1e-3, clip_norm=None, reward_scale=1.,
-        aux_apply='both', aux_tasks=[], aux_lambdas={}):
+        aux_apply='both', aux_tasks=[], aux_lambdas={}, fused_train_step=False, in_graph_updates=False,
+        flat_copies=False, multi_step_train=False, obs_rms_flush_interval=1, overlap_updates=False,
+        shared_aux_run=False):
         # Inputs.
         self.obs0 = tf.placeholder(tf.float32, shape=(None,) + observation_shape, name='obs0')
         self.obs1 = tf.placeholder(tf.float32, shape=(None,) + observation_shape, name='obs1')
@@ -117,6 +231,21 @@ class DDPG(object):
         self.batch_size = batch_size
         self.stats_sample = None
         self.critic_l2_reg = critic_l2_reg
+        self.fused_train_step = fused_train_step
+        self.in_graph_updates = in_graph_updates
+        if self.in_graph_updates:
+            assert self.fused_train_step, 'in-graph updates are only available with the fused train step'
+            assert MPI.COMM_WORLD.Get_size() == 1, 'in-graph updates bypass MpiAdam and require a single process'
+        if self.fused_train_step:
+            assert not (normalize_returns and enable_popart), 'popart needs the target Q on the host before the update'
+        self.flat_copies = flat_copies
+        if self.flat_copies:
+            assert not (normalize_returns and enable_popart), 'popart rescales target critic variables one by one'
+        self.multi_step_train = multi_step_train
+        if self.multi_step_train:
+            assert MPI.COMM_WORLD.Get_size() == 1, 'the in-graph train loop bypasses MpiAdam and requires a single process'
+            assert not (normalize_returns and enable_popart), 'popart needs the target Q on the host before the update'
+            assert not aux_tasks, 'aux tasks are not supported by the in-graph train loop'
 
         # Observation normalization.
         if self.normalize_observations:
@@ -124,6 +253,25 @@ class DDPG(object):
                 self.obs_rms = RunningMeanStd(shape=observation_shape)
         else:
             self.obs_rms = None
+        # Observations are accumulated locally and reduced across workers every obs_rms_flush_interval
+        # stored transitions (0: only on flush_obs_rms(), i.e. once per epoch cycle).
+        self.obs_rms_flush_interval = obs_rms_flush_interval
+        self.obs_rms_pending = 0
+        self.obs_rms_flushes = 0
+        self.obs_rms_flush_time = 0.
+        # Non-blocking MpiAdam reductions. The reductions of one train step stay in flight through
+        # the target and gradient runs of the next, which thus see the parameters one update behind
+        # (delayed gradients). The optimizers keep parameters in host buffers unless something else
+        # writes to their variables (aux tasks share the representations, popart rescales the
+        # critic output layer).
+        self.overlap_updates = overlap_updates
+        # Aux gradients in the actor/critic gradient run, i.e. taken before the actor/critic update
+        # instead of after it in a run of their own.
+        self.shared_aux_run = shared_aux_run
+        self.host_params = overlap_updates and not aux_tasks and not (normalize_returns and enable_popart)
+        # Optimizers whose reductions are in flight, and whether the target update waits behind them.
+        self.pending_updates = []
+        self.target_update_pending = False
         
         self.norm_obs0 = tf.clip_by_value(normalize(self.obs0, self.obs_rms),
             self.observation_range[0], self.observation_range[1])
@@ -172,8 +320,14 @@ class DDPG(object):
         self.normalized_critic_with_actor_tf = critic(self.norm_obs0, self.actor_tf, reuse=True)
         self.critic_with_actor_tf = denormalize(tf.clip_by_value(self.normalized_critic_with_actor_tf, self.return_range[0], self.return_range[1]), self.ret_rms)
         
-        Q_obs1 = denormalize(target_critic(self.norm_obs1, target_actor(self.norm_obs1)), self.ret_rms)
-        self.target_Q = self.rewards + (1. - self.terminals1) * gamma * Q_obs1
+        if self.flat_copies:
+            self.flat_target_actor = FlatCopy(actor, target_actor)
+            self.flat_target_critic = FlatCopy(critic, target_critic)
+        self.target_Q = self.build_target_Q(self.norm_obs1, self.rewards, self.terminals1)
+        if self.fused_train_step:
+            # Regress the critic directly onto the in-graph target, so that target and gradients
+            # come out of the same sess.run.
+            self.critic_target = tf.stop_gradient(self.target_Q)
         
         # Set up parts.
         if self.param_noise is not None:
@@ -189,6 +343,18 @@ class DDPG(object):
         if self.aux_tasks:
             logger.info("aux_tasks:{}".format(self.aux_tasks))
             self.setup_aux_optimizer()
+        if self.fused_train_step:
+            self.setup_fused_train_step()
+        if self.multi_step_train:
+            self.setup_multi_step_train()
+
+    def build_target_Q(self, norm_obs1, rewards, terminals1, reuse=False):
+        if self.flat_copies:
+            with self.flat_target_actor.scope(), self.flat_target_critic.scope():
+                Q_obs1 = denormalize(self.target_critic(norm_obs1, self.target_actor(norm_obs1, reuse=reuse), reuse=reuse), self.ret_rms)
+        else:
+            Q_obs1 = denormalize(self.target_critic(norm_obs1, self.target_actor(norm_obs1, reuse=reuse), reuse=reuse), self.ret_rms)
+        return rewards + (1. - terminals1) * self.gamma * Q_obs1
     
     def setup_aux_optimizer(self):
         logger.info('setting up aux optimizer for actor...')
@@ -200,7 +366,6 @@ class DDPG(object):
             if self.aux_tasks.count(task) > 1:
                 raise ValueError("!! multiple tasks {} given, not valid !!".format(task))
         
-        self.aux_ops = []
         self.aux_losses = tf.Variable(tf.zeros([], dtype=np.float32), name="loss")
         self.aux_vars = set([])
         
@@ -212,7 +377,8 @@ class DDPG(object):
             
         for owner in reprowners:
             if any(task in self.aux_tasks for task in ("tc", "prop", "caus", "repeat")):
-                representation = Representation(name=owner.repr.name, layer_norm=owner.layer_norm)
+                # the owner's own Representation, so that s0 reuses the tower already evaluated on obs0
+                representation = owner.repr
                 self.aux_vars.update(set(representation.trainable_vars))
                 s0 = representation(self.norm_obs0, reuse=True)
             
@@ -272,6 +438,7 @@ class DDPG(object):
                 # prediction loss:
                 #   punish the difference between the actual and predicted next step
                 predictor = Predictor(name=owner.name, layer_norm=owner.layer_norm)
+                predictor.repr = owner.repr
                 reconstr = predictor(self.norm_obs0, self.actions, reuse=True)
                 self.pred_loss = tf.nn.l2_loss(self.norm_obs1 - reconstr)
                 self.aux_losses += normalize_loss(self.pred_loss)
@@ -280,10 +447,125 @@ class DDPG(object):
         self.aux_losses = self.aux_losses / (2 * len(self.aux_tasks))
         self.aux_vars = list(self.aux_vars)
         self.aux_grads = U.flatgrad(self.aux_losses, self.aux_vars, clip_norm=self.clip_norm)
+        self.aux_ops = {'aux_grads': self.aux_grads}
+        aux_loss_ops = {'tc': 'tc_loss', 'prop': 'prop_loss', 'caus': 'caus_loss',
+                        'repeat': 'repeat_loss', 'predict': 'pred_loss'}
+        for task in self.aux_tasks:
+            self.aux_ops[task] = getattr(self, aux_loss_ops[task])
         self.aux_optimizer = MpiAdam(var_list=self.aux_vars,
-                           beta1=0.9, beta2=0.999, epsilon=1e-08)
+                           beta1=0.9, beta2=0.999, epsilon=1e-08, host_params=self.host_params)
+
+    def setup_fused_train_step(self):
+        logger.info('setting up fused train step')
+        ops = {
+            'actor_grads': self.actor_grads,
+            'actor_loss': self.actor_loss,
+            'critic_grads': self.critic_grads,
+            'critic_loss': self.critic_loss,
+        }
+        if self.aux_tasks:
+            ops.update(self.aux_ops)
+
+        if self.in_graph_updates:
+            logger.info('  applying Adam and soft target updates in-graph')
+            # All gradients are read before any variable is written, and optimizers sharing
+            # representation variables are applied one after the other.
+            grads_and_vars = [(self.actor_grads, self.actor.trainable_vars, self.actor_lr, 'actor_adam'),
+                              (self.critic_grads, self.critic.trainable_vars, self.critic_lr, 'critic_adam')]
+            if self.aux_tasks:
+                grads_and_vars.append((self.aux_grads, self.aux_vars, self.actor_lr, 'aux_adam'))
+            # Collect the target pairs before the Adam slots (scoped under the model names) exist.
+            actor_vars, target_actor_vars = self.actor.vars, self.target_actor.vars
+            critic_vars, target_critic_vars = self.critic.vars, self.target_critic.vars
+            deps = list(ops.values())
+            for flatgrad, var_list, lr, name in grads_and_vars:
+                # the model var lists can repeat representation variables; apply each one once
+                grads_and_unique_vars, seen = [], set()
+                for grad, var in zip(unflatten(flatgrad, var_list), var_list):
+                    if var not in seen:
+                        seen.add(var)
+                        grads_and_unique_vars.append((grad, var))
+                with tf.control_dependencies(deps):
+                    optimizer = tf.train.AdamOptimizer(lr, beta1=0.9, beta2=0.999, epsilon=1e-08, name=name)
+                    deps = [optimizer.apply_gradients(grads_and_unique_vars)]
+            with tf.control_dependencies(deps):
+                if self.flat_copies:
+                    actor_soft_updates = self.flat_target_actor.soft_update(self.tau)
+                    critic_soft_updates = self.flat_target_critic.soft_update(self.tau)
+                else:
+                    _, actor_soft_updates = get_target_updates(actor_vars, target_actor_vars, self.tau)
+                    _, critic_soft_updates = get_target_updates(critic_vars, target_critic_vars, self.tau)
+            ops['updates'] = tf.group(actor_soft_updates, critic_soft_updates)
+        self.fused_ops = ops
+
+    def setup_multi_step_train(self):
+        logger.info('setting up multi-step in-graph train loop')
+        # A slice of nb_loop_steps * batch_size replay transitions is fed once; iteration i trains
+        # on its i-th batch_size rows, so every fed transition is used exactly once.
+        self.slice_obs0 = tf.placeholder(tf.float32, shape=self.obs0.get_shape(), name='slice_obs0')
+        self.slice_obs1 = tf.placeholder(tf.float32, shape=self.obs1.get_shape(), name='slice_obs1')
+        self.slice_actions = tf.placeholder(tf.float32, shape=self.actions.get_shape(), name='slice_actions')
+        self.slice_rewards = tf.placeholder(tf.float32, shape=(None, 1), name='slice_rewards')
+        self.slice_terminals1 = tf.placeholder(tf.float32, shape=(None, 1), name='slice_terminals1')
+        self.nb_loop_steps = tf.placeholder(tf.int32, shape=(), name='nb_loop_steps')
+
+        actor_vars = unique(self.actor.trainable_vars)
+        critic_vars = unique(self.critic.trainable_vars)
+        actor_adam = LoopAdam(actor_vars, self.actor_lr, 'actor')
+        critic_adam = LoopAdam(critic_vars, self.critic_lr, 'critic')
+        critic_reg_vars = [var for var in self.critic.trainable_vars if 'kernel' in var.name and 'output' not in var.name]
+        target_pairs = []
+        if not self.flat_copies:
+            for var, target_var in zip(self.actor.vars + self.critic.vars, self.target_actor.vars + self.target_critic.vars):
+                if var not in [v for v, _ in target_pairs]:
+                    target_pairs.append((var, target_var))
+
+        def body(i, critic_loss_sum, actor_loss_sum):
+            start = i * self.batch_size
+            obs0, obs1, actions, rewards, terminals1 = [x[start:start + self.batch_size] for x in
+                (self.slice_obs0, self.slice_obs1, self.slice_actions, self.slice_rewards, self.slice_terminals1)]
+            norm_obs0 = tf.clip_by_value(normalize(obs0, self.obs_rms), self.observation_range[0], self.observation_range[1])
+            norm_obs1 = tf.clip_by_value(normalize(obs1, self.obs_rms), self.observation_range[0], self.observation_range[1])
+
+            reads = LoopReads()
+            with reads.scope():
+                target_Q = tf.stop_gradient(self.build_target_Q(norm_obs1, rewards, terminals1, reuse=True))
+                normalized_critic_tf = self.critic(norm_obs0, actions, reuse=True)
+                actor_tf = self.actor(norm_obs0, reuse=True)
+                normalized_critic_with_actor_tf = self.critic(norm_obs0, actor_tf, reuse=True)
+            critic_with_actor_tf = denormalize(tf.clip_by_value(normalized_critic_with_actor_tf, self.return_range[0], self.return_range[1]), self.ret_rms)
+
+            actor_loss = -tf.reduce_mean(critic_with_actor_tf)
+            normalized_target_Q = tf.clip_by_value(normalize(target_Q, self.ret_rms), self.return_range[0], self.return_range[1])
+            critic_loss = tf.reduce_mean(tf.square(normalized_critic_tf - normalized_target_Q))
+            if self.critic_l2_reg > 0.:
+                critic_loss += self.critic_l2_reg * tf.add_n([tf.nn.l2_loss(var) for var in reads.tensors(critic_reg_vars)])
+            actor_grads = U.flatgrad(normalize_loss(actor_loss), reads.tensors(actor_vars), clip_norm=self.clip_norm)
+            critic_grads = U.flatgrad(normalize_loss(critic_loss), reads.tensors(critic_vars), clip_norm=self.clip_norm)
+
+            # Variables are only written once all gradients of this iteration are computed, and
+            # the next iteration only starts once the target networks are updated.
+            with tf.control_dependencies([actor_grads, critic_grads, actor_loss, critic_loss]):
+                updates = tf.group(actor_adam.update(actor_grads), critic_adam.update(critic_grads))
+            with tf.control_dependencies([updates]):
+                if self.flat_copies:
+                    soft_updates = tf.group(self.flat_target_actor.soft_update(self.tau), self.flat_target_critic.soft_update(self.tau))
+                else:
+                    soft_updates = tf.group(*[tf.assign(target_var, (1. - self.tau) * target_var.read_value() + self.tau * var.read_value())
+                                              for var, target_var in target_pairs])
+            with tf.control_dependencies([soft_updates]):
+                return i + 1, critic_loss_sum + critic_loss, actor_loss_sum + actor_loss
+
+        _, critic_loss_sum, actor_loss_sum = tf.while_loop(lambda i, *_: i < self.nb_loop_steps, body,
+            [tf.constant(0), tf.constant(0.), tf.constant(0.)], parallel_iterations=1)
+        nb_loop_steps = tf.to_float(tf.maximum(self.nb_loop_steps, 1))
+        self.multi_step_losses = [critic_loss_sum / nb_loop_steps, actor_loss_sum / nb_loop_steps]
 
     def setup_target_network_updates(self):
+        if self.flat_copies:
+            self.target_init_updates = [self.flat_target_actor.init_update(), self.flat_target_critic.init_update()]
+            self.target_soft_updates = [self.flat_target_actor.soft_update(self.tau), self.flat_target_critic.soft_update(self.tau)]
+            return
         actor_init_updates, actor_soft_updates = get_target_updates(self.actor.vars, self.target_actor.vars, self.tau)
         critic_init_updates, critic_soft_updates = get_target_updates(self.critic.vars, self.target_critic.vars, self.tau)
         self.target_init_updates = [actor_init_updates, critic_init_updates]
@@ -295,17 +577,31 @@ class DDPG(object):
         # Configure perturbed actor.
         param_noise_actor = copy(self.actor)
         param_noise_actor.name = 'param_noise_actor'
+        param_noise_actor.repr = copy(self.actor.repr)
         param_noise_actor.repr.name = 'param_noise_actor_repr'
-        self.perturbed_actor_tf = param_noise_actor(normalized_obs0)
         logger.info('setting up param noise')
-        self.perturb_policy_ops = get_perturbed_actor_updates(self.actor, param_noise_actor, self.param_noise_stddev)
+        if self.flat_copies:
+            flat_param_noise_actor = FlatCopy(self.actor, param_noise_actor)
+            with flat_param_noise_actor.scope():
+                self.perturbed_actor_tf = param_noise_actor(normalized_obs0)
+            self.perturb_policy_ops = flat_param_noise_actor.perturb_update(self.actor.perturbable_vars, self.param_noise_stddev)
+        else:
+            self.perturbed_actor_tf = param_noise_actor(normalized_obs0)
+            self.perturb_policy_ops = get_perturbed_actor_updates(self.actor, param_noise_actor, self.param_noise_stddev)
 
         # Configure separate copy for stddev adoption.
         adaptive_param_noise_actor = copy(self.actor)
         adaptive_param_noise_actor.name = 'adaptive_param_noise_actor'
+        adaptive_param_noise_actor.repr = copy(self.actor.repr)
         adaptive_param_noise_actor.repr.name = 'adaptive_param_noise_actor_repr'
-        adaptive_actor_tf = adaptive_param_noise_actor(normalized_obs0)
-        self.perturb_adaptive_policy_ops = get_perturbed_actor_updates(self.actor, adaptive_param_noise_actor, self.param_noise_stddev)
+        if self.flat_copies:
+            flat_adaptive_param_noise_actor = FlatCopy(self.actor, adaptive_param_noise_actor)
+            with flat_adaptive_param_noise_actor.scope():
+                adaptive_actor_tf = adaptive_param_noise_actor(normalized_obs0)
+            self.perturb_adaptive_policy_ops = flat_adaptive_param_noise_actor.perturb_update(self.actor.perturbable_vars, self.param_noise_stddev)
+        else:
+            adaptive_actor_tf = adaptive_param_noise_actor(normalized_obs0)
+            self.perturb_adaptive_policy_ops = get_perturbed_actor_updates(self.actor, adaptive_param_noise_actor, self.param_noise_stddev)
         self.adaptive_policy_distance = tf.sqrt(tf.reduce_mean(tf.square(self.actor_tf - adaptive_actor_tf)))
 
     def setup_actor_optimizer(self):
@@ -317,7 +613,7 @@ class DDPG(object):
         logger.info('  actor params: {}'.format(actor_nb_params))
         self.actor_grads = U.flatgrad(normalize_loss(self.actor_loss), self.actor.trainable_vars, clip_norm=self.clip_norm)
         self.actor_optimizer = MpiAdam(var_list=self.actor.trainable_vars,
-            beta1=0.9, beta2=0.999, epsilon=1e-08)
+            beta1=0.9, beta2=0.999, epsilon=1e-08, host_params=self.host_params)
 
     def setup_critic_optimizer(self):
         logger.info('setting up critic optimizer')
@@ -340,7 +636,7 @@ class DDPG(object):
         logger.info('  critic params: {}'.format(critic_nb_params))
         self.critic_grads = U.flatgrad(normalize_loss(self.critic_loss), self.critic.trainable_vars, clip_norm=self.clip_norm)
         self.critic_optimizer = MpiAdam(var_list=self.critic.trainable_vars,
-            beta1=0.9, beta2=0.999, epsilon=1e-08)
+            beta1=0.9, beta2=0.999, epsilon=1e-08, host_params=self.host_params)
 
     def setup_popart(self):
         # See https://arxiv.org/pdf/1602.07714.pdf for details.
@@ -397,6 +693,7 @@ class DDPG(object):
         self.stats_names = names
 
     def pi(self, obs, apply_noise=True, compute_Q=True):
+        self.finish_updates()
         if self.param_noise is not None and apply_noise:
             actor_tf = self.perturbed_actor_tf
         else:
@@ -419,17 +716,34 @@ class DDPG(object):
         reward *= self.reward_scale
         self.memory.append(obs0, action, reward, obs1, terminal1)
         if self.normalize_observations:
-            self.obs_rms.update(np.array([obs0]))
+            self.obs_rms.accumulate(np.array([obs0]))
+            self.obs_rms_pending += 1
+            if self.obs_rms_flush_interval and self.obs_rms_pending >= self.obs_rms_flush_interval:
+                self.flush_obs_rms()
+
+    def flush_obs_rms(self):
+        # Collective: all workers store the same number of transitions, so they flush together.
+        if not self.normalize_observations or self.obs_rms_pending == 0:
+            return
+        tstart = time.time()
+        self.obs_rms.flush()
+        self.obs_rms_flush_time += time.time() - tstart
+        self.obs_rms_flushes += 1
+        self.obs_rms_pending = 0
 
     def train(self):
         # Get a batch.
-        if self.aux_tasks is not None:
-            batch = self.memory.sampletwice(batch_size=self.batch_size)
-        else:
-            batch = self.memory.sample(batch_size=self.batch_size)
+        with logger.profile('replay_sample'):
+            if self.aux_tasks is not None:
+                batch = self.memory.sampletwice(batch_size=self.batch_size)
+            else:
+                batch = self.memory.sample(batch_size=self.batch_size)
         
+        if self.fused_train_step:
+            return self.train_fused(batch)
 
         if self.normalize_returns and self.enable_popart:
+            self.finish_updates() # the rescaling must see the updated critic
             old_mean, old_std, target_Q = self.sess.run([self.ret_rms.mean, self.ret_rms.std, self.target_Q], feed_dict={
                 self.obs1: batch['obs1'],
                 self.rewards: batch['rewards'],
@@ -451,81 +765,137 @@ class DDPG(object):
             # print(target_Q_new, target_Q, new_mean, new_std)
             # assert (np.abs(target_Q - target_Q_new) < 1e-3).all()
         else:
-            target_Q = self.sess.run(self.target_Q, feed_dict={
-                self.obs1: batch['obs1'],
-                self.rewards: batch['rewards'],
-                self.terminals1: batch['terminals1'].astype('float32'),
-            })
-
-        # Get gradients DDPG
-        ops = [self.actor_grads, self.actor_loss, self.critic_grads, self.critic_loss]
+            with logger.profile('sess_run_target'):
+                target_Q = self.sess.run(self.target_Q, feed_dict={
+                    self.obs1: batch['obs1'],
+                    self.rewards: batch['rewards'],
+                    self.terminals1: batch['terminals1'].astype('float32'),
+                })
+
+        # Get gradients DDPG (and AUX with shared_aux_run, so that the representations of each batch
+        # of observations are evaluated once for actor, critic and aux losses).
+        ops = {'actor_grads': self.actor_grads, 'actor_loss': self.actor_loss,
+               'critic_grads': self.critic_grads, 'critic_loss': self.critic_loss}
         feed_dict = { self.obs0: batch['obs0'], 
                       self.actions: batch['actions'], 
                       self.critic_target: target_Q}
-        actor_grads, actor_loss, critic_grads, critic_loss = self.sess.run(ops, feed_dict=feed_dict)
-        
+        if self.aux_tasks and self.shared_aux_run:
+            ops.update(self.aux_ops)
+            feed_dict.update(self.aux_feed_dict(batch))
+        with logger.profile('sess_run'):
+            outputs = self.sess.run(ops, feed_dict=feed_dict)
+        # the reductions of the previous step overlapped the target and gradient runs
+        self.finish_updates()
+        actor_grads, actor_loss = outputs['actor_grads'], outputs['actor_loss']
+        critic_grads, critic_loss = outputs['critic_grads'], outputs['critic_loss']
         
         #print("actor grads norm: {}".format(np.linalg.norm(actor_grads)))
         #print("critic grads norm: {}".format(np.linalg.norm(critic_grads)))
-        # Perform a synced update.
-        self.actor_optimizer.update(actor_grads, stepsize=self.actor_lr)
-        self.critic_optimizer.update(critic_grads, stepsize=self.critic_lr)
+        if self.aux_tasks and not self.shared_aux_run:
+            self.apply_updates(actor_grads, critic_grads)
+            # Get gradients AUX at the updated parameters
+            self.finish_updates()
+            feed_dict = {self.obs0: batch['obs0'], self.actions: batch['actions']}
+            feed_dict.update(self.aux_feed_dict(batch))
+            with logger.profile('sess_run_aux'):
+                outputs.update(self.sess.run(self.aux_ops, feed_dict=feed_dict))
+            self.aux_optimizer.update(outputs['aux_grads'], stepsize=self.actor_lr)
+        else:
+            self.apply_updates(actor_grads, critic_grads, outputs.get('aux_grads'))
         
         auxoutputs = []
-        # Get gradients AUX
         if self.aux_tasks:
-            aux_dict = {}
-            aux_ops = {'aux_grads':self.aux_grads}
-            for index, auxtask in enumerate(self.aux_tasks):
-                if auxtask == 'tc':
-                    aux_dict.update({
-                        self.obs0: batch['obs0'],
-                        self.obs1: batch['obs1'],
-                        self.actions: batch['actions']})
-                    aux_ops.update({'tc':self.tc_loss})
-                if auxtask == 'prop':
-                    aux_dict.update({
-                        self.obs0: batch['obs0'],
-                        self.obs1: batch['obs1'],
-                        self.obs100: batch['obs100'],
-                        self.obs101: batch['obs101'],
-                        self.actions: batch['actions'],
-                        self.actions100: batch['actions100']})
-                    aux_ops.update({'prop':self.prop_loss})
-                if auxtask == 'caus':
-                    aux_dict.update({
-                        self.obs0: batch['obs0'],
-                        self.obs100: batch['obs100'],
-                        self.actions: batch['actions'],
-                        self.actions100: batch['actions100'],
-                        self.rewards: batch['rewards'],
-                        self.rewards100: batch['rewards100']})
-                    aux_ops.update({'caus':self.caus_loss})
-                if auxtask == 'repeat':
-                    aux_dict.update({
-                        self.obs0: batch['obs0'],
-                        self.obs1: batch['obs1'],
-                        self.obs100: batch['obs100'],
-                        self.obs101: batch['obs101'],
-                        self.actions: batch['actions'],
-                        self.actions100: batch['actions100']})
-                    aux_ops.update({'repeat':self.repeat_loss})
-                if auxtask == 'predict':
-                    aux_dict.update({
-                        self.obs0: batch['obs0'],
-                        self.obs1: batch['obs1'],
-                        self.actions: batch['actions']})
-                    aux_ops.update({'predict':self.pred_loss})
-            auxoutputs = self.sess.run(aux_ops, feed_dict=aux_dict)
-            auxgrads = auxoutputs['aux_grads']
+            auxoutputs = {name: outputs[name] for name in self.aux_ops}
             # add act and crit grads to auxoutputs
             auxoutputs['actor_grads'] = actor_grads
             auxoutputs['critic_grads'] = critic_grads
-            #print("aux grads norm: {}".format(np.linalg.norm(auxgrads)))
-            self.aux_optimizer.update(auxgrads, stepsize=self.actor_lr)
+            #print("aux grads norm: {}".format(np.linalg.norm(auxoutputs['aux_grads'])))
         
         return critic_loss, actor_loss, auxoutputs
 
+    def apply_updates(self, actor_grads, critic_grads, aux_grads=None):
+        with logger.profile('apply_updates'):
+            self._apply_updates(actor_grads, critic_grads, aux_grads)
+
+    def _apply_updates(self, actor_grads, critic_grads, aux_grads=None):
+        # Perform a synced update.
+        updates = [(self.actor_optimizer, actor_grads, self.actor_lr), (self.critic_optimizer, critic_grads, self.critic_lr)]
+        if aux_grads is not None:
+            updates.append((self.aux_optimizer, aux_grads, self.actor_lr))
+        if self.overlap_updates:
+            # The reductions stay in flight until the next run that reads the parameters, see
+            # finish_updates().
+            for optimizer, grads, stepsize in updates:
+                optimizer.start_update(grads, stepsize=stepsize)
+            self.pending_updates = [optimizer for optimizer, _, _ in updates]
+        else:
+            for optimizer, grads, stepsize in updates:
+                optimizer.update(grads, stepsize=stepsize)
+
+    def finish_updates(self):
+        # Wait for the reductions started by apply_updates() and apply their Adam steps, then the
+        # target update deferred behind them. Called before every run that reads the parameters,
+        # except the target and gradient runs of the train step that follows apply_updates().
+        if not self.pending_updates:
+            return
+        with logger.profile('finish_updates'):
+            for optimizer in self.pending_updates:
+                optimizer.finish_update()
+            self.pending_updates = []
+            if self.target_update_pending:
+                self.sess.run(self.target_soft_updates)
+                self.target_update_pending = False
+
+    def aux_feed_dict(self, batch):
+        # inputs of the aux losses beyond obs0 and actions
+        feed_dict = {self.obs1: batch['obs1']}
+        if any(task in self.aux_tasks for task in ('prop', 'caus', 'repeat')):
+            feed_dict.update({
+                self.obs100: batch['obs100'],
+                self.obs101: batch['obs101'],
+                self.actions100: batch['actions100']})
+        if 'caus' in self.aux_tasks:
+            feed_dict.update({
+                self.rewards: batch['rewards'],
+                self.rewards100: batch['rewards100']})
+        return feed_dict
+
+    def train_fused(self, batch):
+        # Target Q, actor, critic and aux gradients in a single graph execution.
+        feed_dict = {
+            self.obs0: batch['obs0'],
+            self.obs1: batch['obs1'],
+            self.actions: batch['actions'],
+            self.rewards: batch['rewards'],
+            self.terminals1: batch['terminals1'].astype('float32'),
+        }
+        if self.aux_tasks:
+            feed_dict.update(self.aux_feed_dict(batch))
+        outputs = self.sess.run(self.fused_ops, feed_dict=feed_dict)
+        self.finish_updates()
+
+        if not self.in_graph_updates:
+            self.apply_updates(outputs['actor_grads'], outputs['critic_grads'], outputs.get('aux_grads'))
+
+        auxoutputs = []
+        if self.aux_tasks:
+            auxoutputs = {name: outputs[name] for name in list(self.aux_tasks) + ['aux_grads', 'actor_grads', 'critic_grads']}
+        return outputs['critic_loss'], outputs['actor_loss'], auxoutputs
+
+    def train_multi_step(self, nb_steps):
+        # nb_steps train iterations, including soft target updates, in a single sess.run.
+        self.finish_updates()
+        batch = self.memory.sample(batch_size=self.batch_size * nb_steps)
+        critic_loss, actor_loss = self.sess.run(self.multi_step_losses, feed_dict={
+            self.slice_obs0: batch['obs0'],
+            self.slice_obs1: batch['obs1'],
+            self.slice_actions: batch['actions'],
+            self.slice_rewards: batch['rewards'],
+            self.slice_terminals1: batch['terminals1'].astype('float32'),
+            self.nb_loop_steps: nb_steps,
+        })
+        return critic_loss, actor_loss
+
     def initialize(self, sess):
         self.sess = sess
         self.sess.run(tf.global_variables_initializer())
@@ -534,9 +904,17 @@ class DDPG(object):
         self.sess.run(self.target_init_updates)
 
     def update_target_net(self):
+        if self.in_graph_updates:
+            # already applied as part of the fused train step
+            return
+        if self.pending_updates:
+            # must follow the parameter update, so finish_updates() runs it
+            self.target_update_pending = True
+            return
         self.sess.run(self.target_soft_updates)
 
     def get_stats(self):
+        self.finish_updates()
         if self.stats_sample is None:
             # Get a sample and keep that fixed for all further computations.
             # This allows us to estimate the change in value for the same set of inputs.
@@ -553,11 +931,19 @@ class DDPG(object):
         if self.param_noise is not None:
             stats = {**stats, **self.param_noise.get_stats()}
 
+        if self.normalize_observations:
+            # flush overhead since the last call
+            stats['obs_rms_flushes'] = self.obs_rms_flushes
+            stats['obs_rms_flush_time'] = self.obs_rms_flush_time
+            self.obs_rms_flushes = 0
+            self.obs_rms_flush_time = 0.
+
         return stats
 
     def adapt_param_noise(self):
         if self.param_noise is None:
             return 0.
+        self.finish_updates()
 
         # Perturb a separate copy of the policy to adjust the scale for the next "real" perturbation.
         batch = self.memory.sample(batch_size=self.batch_size)
@@ -575,6 +961,7 @@ class DDPG(object):
 
     def reset(self):
         # Reset internal state after an episode is complete.
+        self.finish_updates()
         if self.action_noise is not None:
             self.action_noise.reset()
         if self.param_noise is not None:
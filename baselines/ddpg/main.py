@@ -16,7 +16,7 @@ import gym
 import tensorflow as tf
 from mpi4py import MPI
 
-def run(env_id, seed, noise_type, layer_norm, evaluation, **kwargs):
+def run(env_id, seed, noise_type, layer_norm, evaluation, memory_budget=None, **kwargs):
     # Configure things.
     rank = MPI.COMM_WORLD.Get_rank()
     if rank != 0:
@@ -54,7 +54,8 @@ def run(env_id, seed, noise_type, layer_norm, evaluation, **kwargs):
             raise RuntimeError('unknown noise type "{}"'.format(current_noise_type))
 
     # Configure components.
-    memory = Memory(limit=int(1e6), action_shape=env.action_space.shape, observation_shape=env.observation_space.shape, seed=seed)
+    memory = Memory(limit=int(1e6), action_shape=env.action_space.shape, observation_shape=env.observation_space.shape, seed=seed,
+                    memory_budget=memory_budget)
     critic = Critic(layer_norm=layer_norm)
     actor = Actor(nb_actions, layer_norm=layer_norm)
 
@@ -112,6 +113,14 @@ def parse_args():
     parser.add_argument('--prop-lambda', type=float, default=1.)
     parser.add_argument('--caus-lambda', type=float, default=1.)
     parser.add_argument('--repeat-lambda', type=float, default=1.)
+    boolean_flag(parser, 'fused-train-step', default=False)
+    boolean_flag(parser, 'in-graph-updates', default=False)  # single process only, requires --fused-train-step
+    boolean_flag(parser, 'flat-copies', default=False)  # target and perturbed networks as flat buffers
+    parser.add_argument('--train-loop-steps', type=int, default=0)  # train steps per in-graph loop, single process only
+    parser.add_argument('--obs-rms-flush-interval', type=int, default=1)  # env steps between obs_rms syncs, 0: once per epoch cycle
+    boolean_flag(parser, 'overlap-updates', default=False)  # non-blocking MpiAdam reductions
+    boolean_flag(parser, 'shared-aux-run', default=False)  # aux gradients in the actor/critic run, before their update
+    parser.add_argument('--memory-budget', type=str, default=None)  # e.g. 4G, caps the replay memory size per MPI worker
     
     boolean_flag(parser, 'evaluation', default=False)
     args = parser.parse_args()
@@ -1,12 +1,16 @@
 import numpy as np
 
+from baselines import logger
+from baselines.common.misc_util import parse_bytes, pretty_bytes
+
 
 class RingBuffer(object):
     def __init__(self, maxlen, shape, dtype='float32'):
         self.maxlen = maxlen
         self.start = 0
         self.length = 0
-        self.data = np.zeros((maxlen,) + shape).astype(dtype)
+        # allocated directly in dtype: pages are only committed once written
+        self.data = np.zeros((maxlen,) + shape, dtype=dtype)
 
     def __len__(self):
         return self.length
@@ -40,7 +44,13 @@ def array_min2d(x):
 
 
 class Memory(object):
-    def __init__(self, limit, action_shape, observation_shape, seed):
+    def __init__(self, limit, action_shape, observation_shape, seed, memory_budget=None):
+        """
+        memory_budget: bytes (or a string like '4G') the buffers may use when full; caps limit
+        """
+        self.transition_nbytes = 4 * (2 * int(np.prod(observation_shape)) + int(np.prod(action_shape)) + 2)
+        if memory_budget is not None:
+            limit = min(limit, parse_bytes(memory_budget) // self.transition_nbytes)
         self.limit = limit
 
         self.observations0 = RingBuffer(limit, shape=observation_shape)
@@ -49,6 +59,7 @@ class Memory(object):
         self.terminals1 = RingBuffer(limit, shape=(1,))
         self.observations1 = RingBuffer(limit, shape=observation_shape)
         np.random.seed(seed)
+        logger.info('Replay memory: %d transitions, %s when full' % (limit, pretty_bytes(self.nbytes)))
 
     def sample(self, batch_size):
         # Draw such that we always have a proceeding element.
@@ -115,3 +126,12 @@ class Memory(object):
     @property
     def nb_entries(self):
         return len(self.observations0)
+
+    @property
+    def nbytes(self):
+        """Footprint of the full memory"""
+        return sum(buf.data.nbytes for buf in (self.observations0, self.actions, self.rewards, self.terminals1, self.observations1))
+
+    def resident_nbytes(self):
+        """Bytes of the buffers written so far"""
+        return self.nb_entries * self.transition_nbytes
@@ -36,8 +36,19 @@ class Representation(Model):
     def __init__(self, name=None, layer_norm=True):
         super(Representation, self).__init__(name=name)
         self.layer_norm = layer_norm
+        self.outputs = {}
         
     def __call__(self, obs, reuse=False):
+        # Evaluate the tower once per observation tensor, so that actor/critic heads and aux losses
+        # built on the same input share it. Keyed by name as well, since shallow model copies share
+        # this dict, and by the enclosing variable scope and its custom getter, since the same
+        # tower built under e.g. a FlatCopy or LoopReads getter reads different tensors.
+        scope = tf.get_variable_scope()
+        key = (obs.graph, self.name, scope.name, scope.custom_getter, obs)
+        if any(k[0] is not obs.graph for k in self.outputs):
+            self.outputs.clear() # built in a new graph: drop the towers of the old one
+        if key in self.outputs:
+            return self.outputs[key]
         with tf.variable_scope(self.name) as scope:
             if reuse:
                 scope.reuse_variables()
@@ -52,6 +63,7 @@ class Representation(Model):
                 x = tc.layers.layer_norm(x, center=True, scale=True)
             x = tf.nn.relu(x)
             
+        self.outputs[key] = x
         return x
         
 class Actor(Model):
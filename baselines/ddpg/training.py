@@ -15,7 +15,9 @@ from mpi4py import MPI
 def train(env, nb_epochs, nb_epoch_cycles, render_eval, reward_scale, render, param_noise, actor, critic,
     normalize_returns, normalize_observations, critic_l2_reg, actor_lr, critic_lr, action_noise,
     popart, gamma, clip_norm, nb_train_steps, nb_rollout_steps, nb_eval_steps, batch_size, memory, 
-    aux_apply, aux_tasks, tc_lambda, prop_lambda, caus_lambda, repeat_lambda, tau=0.01, eval_env=None, param_noise_adaption_interval=50):
+    aux_apply, aux_tasks, tc_lambda, prop_lambda, caus_lambda, repeat_lambda, tau=0.01, eval_env=None, param_noise_adaption_interval=50,
+    fused_train_step=False, in_graph_updates=False, flat_copies=False, train_loop_steps=0, obs_rms_flush_interval=1,
+    overlap_updates=False, shared_aux_run=False):
     rank = MPI.COMM_WORLD.Get_rank()
 
     assert (np.abs(env.action_space.low) == env.action_space.high).all()  # we assume symmetric actions.
@@ -29,7 +31,10 @@ def train(env, nb_epochs, nb_epoch_cycles, render_eval, reward_scale, render, pa
         gamma=gamma, tau=tau, normalize_returns=normalize_returns, normalize_observations=normalize_observations,
         batch_size=batch_size, action_noise=action_noise, param_noise=param_noise, critic_l2_reg=critic_l2_reg,
         actor_lr=actor_lr, critic_lr=critic_lr, enable_popart=popart, clip_norm=clip_norm,
-        reward_scale=reward_scale, aux_tasks=aux_tasks, aux_lambdas=aux_lambdas)
+        reward_scale=reward_scale, aux_tasks=aux_tasks, aux_lambdas=aux_lambdas,
+        fused_train_step=fused_train_step, in_graph_updates=in_graph_updates, flat_copies=flat_copies,
+        multi_step_train=train_loop_steps > 0, obs_rms_flush_interval=obs_rms_flush_interval,
+        overlap_updates=overlap_updates, shared_aux_run=shared_aux_run)
     logger.info('Using agent with the following configuration:')
     logger.info(str(agent.__dict__.items()))
 
@@ -47,6 +52,7 @@ def train(env, nb_epochs, nb_epoch_cycles, render_eval, reward_scale, render, pa
         # Prepare everything.
         agent.initialize(sess)
         sess.graph.finalize()
+        U.maybe_trace_session(sess)
 
         agent.reset()
         obs = env.reset()
@@ -77,7 +83,8 @@ def train(env, nb_epochs, nb_epoch_cycles, render_eval, reward_scale, render, pa
                 # Perform rollouts.
                 for t_rollout in range(nb_rollout_steps):
                     # Predict next action.
-                    action, q = agent.pi(obs, apply_noise=True, compute_Q=True)
+                    with logger.profile('act'):
+                        action, q = agent.pi(obs, apply_noise=True, compute_Q=True)
                     assert action.shape == env.action_space.shape
                     
                     #print("action mean:{} -- Q: {}".format(np.mean(action), q))
@@ -86,7 +93,8 @@ def train(env, nb_epochs, nb_epoch_cycles, render_eval, reward_scale, render, pa
                     if rank == 0 and render:
                         env.render()
                     assert max_action.shape == action.shape
-                    new_obs, r, done, info = env.step(max_action * action)  # scale for execution in env (as far as DDPG is concerned, every action is in [-1, 1])
+                    with logger.profile('env_step'):
+                        new_obs, r, done, info = env.step(max_action * action)  # scale for execution in env (as far as DDPG is concerned, every action is in [-1, 1])
                     t += 1
                     if rank == 0 and render:
                         env.render()
@@ -96,7 +104,8 @@ def train(env, nb_epochs, nb_epoch_cycles, render_eval, reward_scale, render, pa
                     # Book-keeping.
                     epoch_actions.append(action)
                     epoch_qs.append(q)
-                    agent.store_transition(obs, action, r, new_obs, done)
+                    with logger.profile('store'):
+                        agent.store_transition(obs, action, r, new_obs, done)
                     obs = new_obs
 
                     if done:
@@ -110,6 +119,7 @@ def train(env, nb_epochs, nb_epoch_cycles, render_eval, reward_scale, render, pa
                         episodes += 1
                         agent.reset()
                         obs = env.reset()
+                agent.flush_obs_rms()
                 
                 # for the first 5 cycles just gather data
                 if epoch == 0 and cycle < 5:
@@ -129,24 +139,38 @@ def train(env, nb_epochs, nb_epoch_cycles, render_eval, reward_scale, render, pa
                     epoch_aux_losses['aux/'+name] = []
                 epoch_adaptive_distances = []
                 
-                for t_train in range(nb_train_steps):
-                    # Adapt param noise, if necessary.
-                    if memory.nb_entries >= batch_size and t % param_noise_adaption_interval == 0:
-                        distance = agent.adapt_param_noise()
-                        epoch_adaptive_distances.append(distance)
+                if train_loop_steps:
+                    # train_loop_steps train steps run inside a single sess.run.
+                    for t_train in range(0, nb_train_steps, train_loop_steps):
+                        if memory.nb_entries >= batch_size and t % param_noise_adaption_interval == 0:
+                            distance = agent.adapt_param_noise()
+                            epoch_adaptive_distances.append(distance)
 
-                    cl, al, auxl = agent.train()
+                        with logger.profile('train_step'):
+                            cl, al = agent.train_multi_step(min(train_loop_steps, nb_train_steps - t_train))
+                        epoch_critic_losses.append(cl)
+                        epoch_actor_losses.append(al)
+                else:
+                    for t_train in range(nb_train_steps):
+                        # Adapt param noise, if necessary.
+                        if memory.nb_entries >= batch_size and t % param_noise_adaption_interval == 0:
+                            distance = agent.adapt_param_noise()
+                            epoch_adaptive_distances.append(distance)
+
+                        with logger.profile('train_step'):
+                            cl, al, auxl = agent.train()
                     
                     
-                    epoch_critic_losses.append(cl)
-                    epoch_actor_losses.append(al)
-                    for name, value in auxl.items():
-                        if 'grads' in name:
-                            epoch_aux_losses['grads/'+name].append(np.abs(value))
-                        else:
-                            epoch_aux_losses['aux/'+name].append(np.abs(value))
-
-                    agent.update_target_net()
+                        epoch_critic_losses.append(cl)
+                        epoch_actor_losses.append(al)
+                        for name, value in auxl.items():
+                            if 'grads' in name:
+                                epoch_aux_losses['grads/'+name].append(np.abs(value))
+                            else:
+                                epoch_aux_losses['aux/'+name].append(np.abs(value))
+
+                        with logger.profile('target_update'):
+                            agent.update_target_net()
                 
                 ep_train_times.append(time.time()-train_startt)
                 
@@ -209,16 +233,19 @@ def train(env, nb_epochs, nb_epoch_cycles, render_eval, reward_scale, render, pa
                     return x
                 else:
                     raise ValueError('expected scalar, got %s'%x)
-            combined_stats_sums = MPI.COMM_WORLD.allreduce(np.array([as_scalar(x) for x in combined_stats.values()]))
+            with logger.profile('mpi_stats'):
+                combined_stats_sums = MPI.COMM_WORLD.allreduce(np.array([as_scalar(x) for x in combined_stats.values()]))
             combined_stats = {k : v / mpi_size for (k,v) in zip(combined_stats.keys(), combined_stats_sums)}
 
             # Total statistics.
             combined_stats['total/epochs'] = epoch + 1
             combined_stats['total/steps'] = t
+            combined_stats['memory/replay_bytes'] = memory.resident_nbytes()
 
             for key in sorted(combined_stats.keys()):
                 logger.record_tabular(key, combined_stats[key])
-            logger.dump_tabular()
+            with logger.profile('logging'):
+                logger.dump_tabular()
             logger.info('')
             logdir = logger.get_dir()
             if rank == 0 and logdir:
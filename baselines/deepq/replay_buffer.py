@@ -1,11 +1,13 @@
 import numpy as np
 import random
 
+from baselines import logger
+from baselines.common.misc_util import parse_bytes, pretty_bytes
 from baselines.common.segment_tree import SumSegmentTree, MinSegmentTree
 
 
 class ReplayBuffer(object):
-    def __init__(self, size):
+    def __init__(self, size, memory_budget=None, ob_shape=None, ob_dtype=np.float32):
         """Create Replay buffer.
 
         Parameters
@@ -13,14 +15,47 @@ class ReplayBuffer(object):
         size: int
             Max number of transitions to store in the buffer. When the buffer
             overflows the old memories are dropped.
+        memory_budget: int or str or None
+            Bytes (or a string like '4G') the observations may use when the
+            buffer is full. Caps size; requires ob_shape.
+        ob_shape: tuple or None
+            Observation shape, used to account for the memory of the buffer.
+            The figure is an upper bound: stacked frames (LazyFrames) are
+            shared between consecutive observations, by an amount that is not
+            known in advance. A buffer sized from it to memory_budget stays
+            within the budget, but may hold fewer transitions than would fit.
+        ob_dtype: np.dtype
+            Observation dtype.
         """
+        self._transition_nbytes = None
+        if ob_shape is not None:
+            # obs_t and obs_tp1 as separate arrays
+            self._transition_nbytes = 2 * int(np.prod(ob_shape)) * np.dtype(ob_dtype).itemsize
+        if memory_budget is not None:
+            assert self._transition_nbytes is not None, 'memory_budget requires ob_shape'
+            size = min(size, parse_bytes(memory_budget) // self._transition_nbytes)
         self._storage = []
         self._maxsize = size
         self._next_idx = 0
+        if self._transition_nbytes is not None:
+            logger.info('Replay buffer: %d transitions, at most %s of observations when full' % (size, pretty_bytes(self.nbytes)))
 
     def __len__(self):
         return len(self._storage)
 
+    @property
+    def nbytes(self):
+        """Upper bound on the footprint of the observations in the full buffer, None without ob_shape"""
+        if self._transition_nbytes is None:
+            return None
+        return self._maxsize * self._transition_nbytes
+
+    def resident_nbytes(self):
+        """Upper bound on the footprint of the observations stored so far, None without ob_shape"""
+        if self._transition_nbytes is None:
+            return None
+        return len(self._storage) * self._transition_nbytes
+
     def add(self, obs_t, action, reward, obs_tp1, done):
         data = (obs_t, action, reward, obs_tp1, done)
 
@@ -69,7 +104,7 @@ class ReplayBuffer(object):
 
 
 class PrioritizedReplayBuffer(ReplayBuffer):
-    def __init__(self, size, alpha):
+    def __init__(self, size, alpha, memory_budget=None, ob_shape=None, ob_dtype=np.float32):
         """Create Prioritized Replay buffer.
 
         Parameters
@@ -85,12 +120,12 @@ class PrioritizedReplayBuffer(ReplayBuffer):
         --------
         ReplayBuffer.__init__
         """
-        super(PrioritizedReplayBuffer, self).__init__(size)
+        super(PrioritizedReplayBuffer, self).__init__(size, memory_budget, ob_shape, ob_dtype)
         assert alpha > 0
         self._alpha = alpha
 
         it_capacity = 1
-        while it_capacity < size:
+        while it_capacity < self._maxsize:
             it_capacity *= 2
 
         self._it_sum = SumSegmentTree(it_capacity)
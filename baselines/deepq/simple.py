@@ -97,7 +97,8 @@ def learn(env,
           prioritized_replay_beta_iters=None,
           prioritized_replay_eps=1e-6,
           param_noise=False,
-          callback=None):
+          callback=None,
+          memory_budget=None):
     """Train a deepq model.
 
     Parameters
@@ -156,6 +157,9 @@ def learn(env,
     callback: (locals, globals) -> None
         function called at every steps with state of the algorithm.
         If callback returns true training stops.
+    memory_budget: int or str or None
+        if not None, caps buffer_size so that the replay buffer observations fit in this many
+        bytes (e.g. '4G'), counting every observation at full size.
 
     Returns
     -------
@@ -193,15 +197,17 @@ def learn(env,
     act = ActWrapper(act, act_params)
 
     # Create the replay buffer
+    buffer_kwargs = dict(memory_budget=memory_budget, ob_shape=env.observation_space.shape,
+                         ob_dtype=getattr(env.observation_space, 'dtype', np.float32))
     if prioritized_replay:
-        replay_buffer = PrioritizedReplayBuffer(buffer_size, alpha=prioritized_replay_alpha)
+        replay_buffer = PrioritizedReplayBuffer(buffer_size, alpha=prioritized_replay_alpha, **buffer_kwargs)
         if prioritized_replay_beta_iters is None:
             prioritized_replay_beta_iters = max_timesteps
         beta_schedule = LinearSchedule(prioritized_replay_beta_iters,
                                        initial_p=prioritized_replay_beta0,
                                        final_p=1.0)
     else:
-        replay_buffer = ReplayBuffer(buffer_size)
+        replay_buffer = ReplayBuffer(buffer_size, **buffer_kwargs)
         beta_schedule = None
     # Create the schedule for exploration starting from 1.
     exploration = LinearSchedule(schedule_timesteps=int(exploration_fraction * max_timesteps),
@@ -276,6 +282,7 @@ def learn(env,
                 logger.record_tabular("episodes", num_episodes)
                 logger.record_tabular("mean 100 episode reward", mean_100ep_reward)
                 logger.record_tabular("% time spent exploring", int(100 * exploration.value(t)))
+                logger.record_tabular("replay buffer max bytes", replay_buffer.resident_nbytes())
                 logger.dump_tabular()
 
             if (checkpoint_freq is not None and t > learning_starts and
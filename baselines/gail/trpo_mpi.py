@@ -16,7 +16,9 @@ from baselines.common import explained_variance, zipsame, dataset, fmt_row
 from baselines import logger
 from baselines.common import colorize
 from baselines.common.mpi_adam import MpiAdam
-from baselines.common.cg import cg
+from baselines.common.mpi_compression import get_compressor
+from baselines.common.mpi_hierarchical import get_comm
+from baselines.common.cg import cg, get_precond
 from baselines.gail.statistics import stats
 
 
@@ -48,7 +50,8 @@ def traj_segment_generator(pi, env, reward_giver, horizon, stochastic):
 
     while True:
         prevac = ac
-        ac, vpred = pi.act(stochastic, ob)
+        with logger.profile('act'):
+            ac, vpred = pi.act(stochastic, ob)
         # Slight weirdness here because we need value function at time T
         # before returning segment [0, T-1] so we get the correct
         # terminal value
@@ -70,7 +73,8 @@ def traj_segment_generator(pi, env, reward_giver, horizon, stochastic):
         prevacs[i] = prevac
 
         rew = reward_giver.get_reward(ob, ac)
-        ob, true_rew, new, _ = env.step(ac)
+        with logger.profile('env_step'):
+            ob, true_rew, new, _ = env.step(ac)
         rews[i] = rew
         true_rews[i] = true_rew
 
@@ -108,6 +112,8 @@ def learn(env, policy_func, reward_giver, expert_dataset, rank,
           ckpt_dir, log_dir, timesteps_per_batch, task_name,
           gamma, lam,
           max_kl, cg_iters, cg_damping=1e-2,
+          fisher_subsample=0.2, cg_precond=None, precond_probes=4,
+          compression=None, topk_ratio=0.01,
           vf_stepsize=3e-4, d_stepsize=3e-4, vf_iters=3,
           max_timesteps=0, max_episodes=0, max_iters=0,
           callback=None
@@ -149,8 +155,8 @@ def learn(env, policy_func, reward_giver, expert_dataset, rank,
     var_list = [v for v in all_var_list if v.name.startswith("pi/pol") or v.name.startswith("pi/logstd")]
     vf_var_list = [v for v in all_var_list if v.name.startswith("pi/vff")]
     assert len(var_list) == len(vf_var_list) + 1
-    d_adam = MpiAdam(reward_giver.get_trainable_variables())
-    vfadam = MpiAdam(vf_var_list)
+    d_adam = MpiAdam(reward_giver.get_trainable_variables(), compression=compression, topk_ratio=topk_ratio)
+    vfadam = MpiAdam(vf_var_list, compression=compression, topk_ratio=topk_ratio)
 
     get_flat = U.GetFlat(var_list)
     set_from_flat = U.SetFromFlat(var_list)
@@ -175,20 +181,29 @@ def learn(env, policy_func, reward_giver, expert_dataset, rank,
 
     @contextmanager
     def timed(msg):
-        if rank == 0:
-            print(colorize(msg, color='magenta'))
-            tstart = time.time()
-            yield
-            print(colorize("done in %.3f seconds" % (time.time() - tstart), color='magenta'))
-        else:
-            yield
+        with logger.profile(msg):
+            if rank == 0:
+                print(colorize(msg, color='magenta'))
+                tstart = time.time()
+                yield
+                print(colorize("done in %.3f seconds" % (time.time() - tstart), color='magenta'))
+            else:
+                yield
 
-    def allmean(x):
+    # one compressor per reduced quantity: top-k error feedback is only valid within a single gradient stream.
+    # vfadam/d_adam reduce (and compress) their local gradients themselves.
+    pg_comp = get_compressor(compression, name='pg', ratio=topk_ratio)
+    vec_comp = get_compressor(compression, name='fvp', grad=False)
+
+    def allmean(x, compressor=None):
         assert isinstance(x, np.ndarray)
-        out = np.empty_like(x)
-        MPI.COMM_WORLD.Allreduce(x, out, op=MPI.SUM)
-        out /= nworkers
-        return out
+        with logger.profile('mpi_allmean'):
+            if compressor is not None:
+                return compressor.allreduce(x) / nworkers
+            out = np.empty_like(x)
+            get_comm().Allreduce(x, out, op=MPI.SUM)
+            out /= nworkers
+            return out
 
     U.initialize()
     th_init = get_flat()
@@ -239,7 +254,8 @@ def learn(env, policy_func, reward_giver, expert_dataset, rank,
         logger.log("********** Iteration %i ************" % iters_so_far)
 
         def fisher_vector_product(p):
-            return allmean(compute_fvp(p, *fvpargs)) + cg_damping * p
+            return allmean(compute_fvp(p, *fvpargs), vec_comp) + cg_damping * p
+
         # ------------------ Update G ------------------
         logger.log("Optimizing Policy...")
         for _ in range(g_step):
@@ -254,18 +270,23 @@ def learn(env, policy_func, reward_giver, expert_dataset, rank,
             if hasattr(pi, "ob_rms"): pi.ob_rms.update(ob)  # update running mean/std for policy
 
             args = seg["ob"], seg["ac"], atarg
-            fvpargs = [arr[::5] for arr in args]
+            # Fisher-vector products use a random subsample of the segment, fixed for this iteration
+            nsub = max(1, int(np.ceil(fisher_subsample * len(atarg))))
+            fvpidx = np.sort(np.random.choice(len(atarg), nsub, replace=False))
+            fvpargs = [arr[fvpidx] for arr in args]
 
             assign_old_eq_new()  # set old parameter values to new parameter values
             with timed("computegrad"):
                 *lossbefore, g = compute_lossandgrad(*args)
             lossbefore = allmean(np.array(lossbefore))
-            g = allmean(g)
+            g = allmean(g, pg_comp)
             if np.allclose(g, 0):
                 logger.log("Got zero gradient. not updating")
             else:
                 with timed("cg"):
-                    stepdir = cg(fisher_vector_product, g, cg_iters=cg_iters, verbose=rank == 0)
+                    precond = get_precond(cg_precond, lambda p: compute_fvp(p, *fvpargs), g.size, cg_damping,
+                                          nprobes=precond_probes, reduce=lambda d: allmean(d, vec_comp))
+                    stepdir = cg(fisher_vector_product, g, cg_iters=cg_iters, precond=precond, verbose=rank == 0)
                 assert np.isfinite(stepdir).all()
                 shs = .5*stepdir.dot(fisher_vector_product(stepdir))
                 lm = np.sqrt(shs / max_kl)
@@ -303,7 +324,7 @@ def learn(env, policy_func, reward_giver, expert_dataset, rank,
                                                              include_final_partial_batch=False, batch_size=128):
                         if hasattr(pi, "ob_rms"):
                             pi.ob_rms.update(mbob)  # update running mean/std for policy
-                        g = allmean(compute_vflossandgrad(mbob, mbret))
+                        g = compute_vflossandgrad(mbob, mbret)
                         vfadam.update(g, vf_stepsize)
 
         g_losses = meanlosses
@@ -323,7 +344,7 @@ def learn(env, policy_func, reward_giver, expert_dataset, rank,
             # update running mean/std for reward_giver
             if hasattr(reward_giver, "obs_rms"): reward_giver.obs_rms.update(np.concatenate((ob_batch, ob_expert), 0))
             *newlosses, g = reward_giver.lossandgrad(ob_batch, ac_batch, ob_expert, ac_expert)
-            d_adam.update(allmean(g), d_stepsize)
+            d_adam.update(g, d_stepsize)
             d_losses.append(newlosses)
         logger.log(fmt_row(13, np.mean(d_losses, axis=0)))
 
@@ -347,7 +368,10 @@ def learn(env, policy_func, reward_giver, expert_dataset, rank,
         logger.record_tabular("TimeElapsed", time.time() - tstart)
 
         if rank == 0:
-            logger.dump_tabular()
+            with logger.profile('logging'):
+                logger.dump_tabular()
+        else:
+            logger.clear_profile()
 
 
 def flatten_lists(listoflists):
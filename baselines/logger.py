@@ -6,9 +6,13 @@ import json
 import time
 import datetime
 import tempfile
+import threading
+import queue
+import atexit
+import weakref
 
 LOG_OUTPUT_FORMATS = ['stdout', 'log', 'csv', 'tensorboard']
-# Also valid: json, tensorboard
+# Also valid: json, tensorboard, columns
 
 DEBUG = 10
 INFO = 20
@@ -18,13 +22,23 @@ ERROR = 40
 DISABLED = 50
 
 class KVWriter(object):
+    autoflush = True # flush after every write; AsyncOutputFormat turns it off and flushes on an interval
+
     def writekvs(self, kvs):
         raise NotImplementedError
 
+    def flush(self):
+        pass
+
 class SeqWriter(object):
+    autoflush = True
+
     def writeseq(self, seq):
         raise NotImplementedError
 
+    def flush(self):
+        pass
+
 class HumanOutputFormat(KVWriter, SeqWriter):
     def __init__(self, filename_or_file):
         if isinstance(filename_or_file, str):
@@ -67,7 +81,8 @@ class HumanOutputFormat(KVWriter, SeqWriter):
         self.file.write('\n'.join(lines) + '\n')
 
         # Flush the output to the file
-        self.file.flush()
+        if self.autoflush:
+            self.file.flush()
 
     def _truncate(self, s):
         return s[:20] + '...' if len(s) > 23 else s
@@ -76,6 +91,10 @@ class HumanOutputFormat(KVWriter, SeqWriter):
         for arg in seq:
             self.file.write(arg)
         self.file.write('\n')
+        if self.autoflush:
+            self.file.flush()
+
+    def flush(self):
         self.file.flush()
 
     def close(self):
@@ -92,34 +111,32 @@ class JSONOutputFormat(KVWriter):
                 v = v.tolist()
                 kvs[k] = float(v)
         self.file.write(json.dumps(kvs) + '\n')
+        if self.autoflush:
+            self.file.flush()
+
+    def flush(self):
         self.file.flush()
 
     def close(self):
         self.file.close()
 
 class CSVOutputFormat(KVWriter):
+    """
+    Append-only: columns are never reordered, and when new keys show up the full header is
+    restated on a '#'-prefixed line instead of rewriting the file. Rows written before that
+    line simply have fewer fields; read_csv pads them.
+    """
     def __init__(self, filename):
-        self.file = open(filename, 'w+t')
+        self.file = open(filename, 'wt')
         self.keys = []
         self.sep = ','
 
     def writekvs(self, kvs):
-        # Add our current row to the history
-        extra_keys = kvs.keys() - self.keys
+        extra_keys = sorted(kvs.keys() - self.keys)
         if extra_keys:
+            prefix = '#' if self.keys else ''
             self.keys.extend(extra_keys)
-            self.file.seek(0)
-            lines = self.file.readlines()
-            self.file.seek(0)
-            for (i, k) in enumerate(self.keys):
-                if i > 0:
-                    self.file.write(',')
-                self.file.write(k)
-            self.file.write('\n')
-            for line in lines[1:]:
-                self.file.write(line[:-1])
-                self.file.write(self.sep * len(extra_keys))
-                self.file.write('\n')
+            self.file.write(prefix + self.sep.join(self.keys) + '\n')
         for (i, k) in enumerate(self.keys):
             if i > 0:
                 self.file.write(',')
@@ -127,6 +144,10 @@ class CSVOutputFormat(KVWriter):
             if v:
                 self.file.write(str(v))
         self.file.write('\n')
+        if self.autoflush:
+            self.file.flush()
+
+    def flush(self):
         self.file.flush()
 
     def close(self):
@@ -161,18 +182,164 @@ class TensorBoardOutputFormat(KVWriter):
         event = self.event_pb2.Event(wall_time=time.time(), summary=summary)
         event.step = self.step # is there any reason why you'd want to specify the step?
         self.writer.WriteEvent(event)
-        self.writer.Flush()
+        if self.autoflush:
+            self.writer.Flush()
         self.step += 1
 
+    def flush(self):
+        self.writer.Flush()
+
     def close(self):
         if self.writer:
             self.writer.Close()
             self.writer = None
 
+class ColumnOutputFormat(KVWriter):
+    """
+    Appendable binary columns, one pair of raw files per key:
+        <key>.val  float64 values
+        <key>.step int64 index of the dump each value was logged at
+    plus index.json (key -> file name, number of dumps). Read with read_columns.
+    """
+    def __init__(self, dir):
+        import numpy as np
+        self.np = np
+        os.makedirs(dir, exist_ok=True)
+        self.dir = dir
+        self.fnames = {}
+        self.pending = {} # key -> ([steps], [values]) not yet written
+        self.nrows = 0
+
+    def writekvs(self, kvs):
+        for k, v in kvs.items():
+            try:
+                v = float(v)
+            except (TypeError, ValueError):
+                continue # only numeric values are stored
+            if k not in self.fnames:
+                fname = ''.join(c if c.isalnum() or c in '-_.' else '_' for c in k)
+                while fname in self.fnames.values():
+                    fname += '_'
+                self.fnames[k] = fname
+            steps, vals = self.pending.setdefault(k, ([], []))
+            steps.append(self.nrows)
+            vals.append(v)
+        self.nrows += 1
+        if self.autoflush:
+            self.flush()
+
+    def flush(self):
+        np = self.np
+        for k, (steps, vals) in self.pending.items():
+            path = osp.join(self.dir, self.fnames[k])
+            with open(path + '.step', 'ab') as fh:
+                fh.write(np.array(steps, 'int64').tobytes())
+            with open(path + '.val', 'ab') as fh:
+                fh.write(np.array(vals, 'float64').tobytes())
+        self.pending = {}
+        tmp = osp.join(self.dir, 'index.json.tmp')
+        with open(tmp, 'wt') as fh:
+            json.dump({'keys': self.fnames, 'nrows': self.nrows}, fh)
+        os.replace(tmp, osp.join(self.dir, 'index.json'))
+
+    def close(self):
+        self.flush()
+
+class AsyncOutputFormat(KVWriter, SeqWriter):
+    """
+    Hands writes to a background thread through a bounded queue (dumps block once maxsize
+    writes are pending). The wrapped format is flushed every flush_interval seconds and on
+    flush(); close() drains the queue, as does process exit for formats that are still open.
+    """
+    _live = weakref.WeakSet()
+
+    def __init__(self, fmt, maxsize=100, flush_interval=5.):
+        self.fmt = fmt
+        self.fmt.autoflush = False
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.error = None
+        self.thread = threading.Thread(target=self._run, name='logger-%s' % type(fmt).__name__, daemon=True)
+        self.thread.start()
+        AsyncOutputFormat._live.add(self)
+
+    def writekvs(self, kvs):
+        if isinstance(self.fmt, KVWriter):
+            self._put(('kvs', dict(kvs))) # the logger clears kvs right after the dump
+
+    def writeseq(self, seq):
+        if isinstance(self.fmt, SeqWriter):
+            self._put(('seq', list(seq)))
+
+    def _put(self, item):
+        if self.error is not None:
+            raise self.error
+        self.queue.put(item)
+
+    def _run(self):
+        lastflush = time.time()
+        while True:
+            try:
+                kind, arg = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                kind, arg = 'flush', None
+            try:
+                if kind == 'kvs':
+                    self.fmt.writekvs(arg)
+                elif kind == 'seq':
+                    self.fmt.writeseq(arg)
+                if kind in ('flush', 'close') or time.time() - lastflush >= self.flush_interval:
+                    self.fmt.flush()
+                    lastflush = time.time()
+            except Exception as e:
+                self.error = e
+            if kind == 'flush' and arg is not None:
+                arg.set()
+            if kind == 'close':
+                return
+
+    def flush(self):
+        # blocks until everything written so far has reached the wrapped format's file
+        if self.thread is None:
+            return
+        done = threading.Event()
+        self._put(('flush', done))
+        done.wait()
+        if self.error is not None:
+            raise self.error
+
+    def close(self):
+        if self.thread is None:
+            return
+        self.queue.put(('close', None))
+        self.thread.join()
+        self.thread = None
+        AsyncOutputFormat._live.discard(self)
+        self.fmt.close()
+        if self.error is not None:
+            raise self.error
+
+@atexit.register
+def _drain_async_formats():
+    for fmt in list(AsyncOutputFormat._live):
+        fmt.close()
+
+def get_rank():
+    """
+    MPI rank of this process, without importing mpi4py (and initializing MPI): taken from an
+    already imported mpi4py or the launcher's environment (MPICH/Intel MPI, Open MPI, PMIx,
+    Slurm), otherwise 0.
+    """
+    if 'mpi4py.MPI' in sys.modules:
+        return sys.modules['mpi4py.MPI'].COMM_WORLD.Get_rank()
+    for var in ['PMI_RANK', 'OMPI_COMM_WORLD_RANK', 'PMIX_RANK', 'SLURM_PROCID']:
+        if var in os.environ:
+            return int(os.environ[var])
+    return 0
+
 def make_output_format(format, ev_dir):
-    from mpi4py import MPI
     os.makedirs(ev_dir, exist_ok=True)
-    rank = MPI.COMM_WORLD.Get_rank()
+    rank = get_rank()
     if format == 'stdout':
         return HumanOutputFormat(sys.stdout)
     elif format == 'log':
@@ -187,6 +354,9 @@ def make_output_format(format, ev_dir):
     elif format == 'tensorboard':
         assert rank==0
         return TensorBoardOutputFormat(osp.join(ev_dir, 'tb'))
+    elif format == 'columns':
+        assert rank==0
+        return ColumnOutputFormat(osp.join(ev_dir, 'columns'))
     else:
         raise ValueError('Unknown format specified: %s' % (format,))
 
@@ -256,10 +426,104 @@ def get_dir():
 record_tabular = logkv
 dump_tabular = dumpkvs
 
+# ================================================================
+# Profiling
+# ================================================================
+
+def profile(name):
+    """
+    Time a block: `with logger.profile('env_step'): ...`. Nested blocks are named
+    'outer/inner'. Percentiles of the durations are logged as prof/<name>_* on every dump.
+    A shared no-op context is returned while profiling is disabled.
+    """
+    return Profiler.CURRENT.timer(name)
+
+def profile_count(name, n=1):
+    """
+    Add n to counter name, logged (and reset) as count/<name> on every dump
+    """
+    if Profiler.CURRENT.enabled:
+        Profiler.CURRENT.count(name, n)
+
+def clear_profile():
+    """
+    Drop the timings and counts recorded since the last dump. Workers that never dump call this
+    where the others dump, so that their samples do not pile up.
+    """
+    Profiler.CURRENT.clear()
+
+def set_profiling(enabled=True):
+    Profiler.CURRENT.enabled = enabled
+
 # ================================================================
 # Backend
 # ================================================================
 
+class _NullTimer(object):
+    def __enter__(self):
+        pass
+    def __exit__(self, *args):
+        pass
+
+class _Timer(object):
+    __slots__ = ('profiler', 'name', 'tstart')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        stack = self.profiler.stack
+        stack.append(stack[-1] + '/' + self.name if stack else self.name)
+        self.tstart = time.perf_counter()
+
+    def __exit__(self, *args):
+        dt = time.perf_counter() - self.tstart
+        self.profiler.times.setdefault(self.profiler.stack.pop(), []).append(dt)
+
+class Profiler(object):
+    CURRENT = None
+    PERCENTILES = (50, 90, 99)
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.stack = []
+        self.times = {}
+        self.counts = {}
+        self._null = _NullTimer()
+
+    def timer(self, name):
+        if not self.enabled:
+            return self._null
+        return _Timer(self, name)
+
+    def count(self, name, n=1):
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    def getkvs(self):
+        """
+        Summary of everything recorded since the last call, which is then cleared
+        """
+        kvs = {}
+        if self.times:
+            import numpy as np
+            for (name, times) in self.times.items():
+                times = np.array(times)
+                for (p, v) in zip(self.PERCENTILES, np.percentile(times, self.PERCENTILES)):
+                    kvs['prof/%s_p%d' % (name, p)] = v
+                kvs['prof/%s_total' % name] = times.sum()
+                kvs['prof/%s_n' % name] = len(times)
+        for (name, n) in self.counts.items():
+            kvs['count/%s' % name] = n
+        self.clear()
+        return kvs
+
+    def clear(self):
+        self.times = {}
+        self.counts = {}
+
+Profiler.CURRENT = Profiler(enabled=os.getenv('OPENAI_PROFILE', '0') == '1')
+
 class Logger(object):
     DEFAULT = None  # A logger with no output files. (See right below class definition)
                     # So that you can still log to the terminal without setting up any output files
@@ -277,6 +541,8 @@ class Logger(object):
         self.name2val[key] = val
 
     def dumpkvs(self):
+        if Profiler.CURRENT.enabled:
+            self.name2val.update(Profiler.CURRENT.getkvs())
         if self.level == DISABLED: return
         for fmt in self.output_formats:
             if isinstance(fmt, KVWriter):
@@ -308,7 +574,11 @@ class Logger(object):
 
 Logger.DEFAULT = Logger.CURRENT = Logger(dir=None, output_formats=[HumanOutputFormat(sys.stdout)])
 
-def configure(dir=None, format_strs=None):
+def configure(dir=None, format_strs=None, async_writes=None):
+    """
+    async_writes: write every output format except stdout from a background thread (see
+    AsyncOutputFormat). Defaults to the OPENAI_LOG_ASYNC environment variable.
+    """
     if dir is None:
         dir = os.getenv('OPENAI_LOGDIR')
     if dir is None:
@@ -321,6 +591,10 @@ def configure(dir=None, format_strs=None):
         strs = os.getenv('OPENAI_LOG_FORMAT')
         format_strs = strs.split(',') if strs else LOG_OUTPUT_FORMATS
     output_formats = [make_output_format(f, dir) for f in format_strs]
+    if async_writes is None:
+        async_writes = os.getenv('OPENAI_LOG_ASYNC', '0') == '1'
+    if async_writes:
+        output_formats = [fmt if f == 'stdout' else AsyncOutputFormat(fmt) for (f, fmt) in zip(format_strs, output_formats)]
 
     Logger.CURRENT = Logger(dir=dir, output_formats=output_formats)
     log('Logging to %s'%dir)
@@ -332,13 +606,14 @@ def reset():
         log('Reset logger')
 
 class scoped_configure(object):
-    def __init__(self, dir=None, format_strs=None):
+    def __init__(self, dir=None, format_strs=None, async_writes=None):
         self.dir = dir
         self.format_strs = format_strs
+        self.async_writes = async_writes
         self.prevlogger = None
     def __enter__(self):
         self.prevlogger = Logger.CURRENT
-        configure(dir=self.dir, format_strs=self.format_strs)
+        configure(dir=self.dir, format_strs=self.format_strs, async_writes=self.async_writes)
     def __exit__(self, *args):
         Logger.CURRENT.close()
         Logger.CURRENT = self.prevlogger
@@ -382,8 +657,65 @@ def read_json(fname):
     return pandas.DataFrame(ds)
 
 def read_csv(fname):
+    """
+    Reads a CSVOutputFormat file, including the header lines appended when keys were added
+    """
+    import io
     import pandas
-    return pandas.read_csv(fname, index_col=None, comment='#')
+    with open(fname, 'rt') as fh:
+        lines = fh.read().splitlines()
+    if not lines:
+        return pandas.DataFrame()
+    keys = lines[0].split(',')
+    rows = []
+    for line in lines[1:]:
+        if line.startswith('#'):
+            keys = line[1:].split(',')
+        else:
+            rows.append((line, len(keys)))
+    lines = [','.join(keys)] + [line + ',' * (len(keys) - nkeys) for (line, nkeys) in rows]
+    return pandas.read_csv(io.StringIO('\n'.join(lines) + '\n'), index_col=None)
+
+def read_columns(path, keys=None):
+    """
+    path : a ColumnOutputFormat directory, or a log directory containing one
+    keys : keys to load, all of them if None
+    Returns {key: array with one entry per dump, NaN where the key was not logged}. Columns
+    logged at every dump are read-only memory maps of the value file.
+    """
+    import numpy as np
+    if osp.isdir(osp.join(path, 'columns')):
+        path = osp.join(path, 'columns')
+    with open(osp.join(path, 'index.json'), 'rt') as fh:
+        index = json.load(fh)
+    nrows = index['nrows']
+    columns = {}
+    for k in (index['keys'] if keys is None else keys):
+        if k not in index['keys']:
+            continue # never logged in this run
+        fname = osp.join(path, index['keys'][k])
+        if os.path.getsize(fname + '.val') == 0:
+            columns[k] = np.full(nrows, np.nan)
+            continue
+        # a writer may be appending: only trust entries up to nrows
+        steps = np.memmap(fname + '.step', dtype='int64', mode='r')
+        vals = np.memmap(fname + '.val', dtype='float64', mode='r')
+        n = min(len(steps), len(vals))
+        n = np.searchsorted(steps[:n], nrows)
+        steps, vals = steps[:n], vals[:n]
+        if n == nrows:
+            columns[k] = vals # dense, steps == arange(nrows)
+        else:
+            col = np.full(nrows, np.nan)
+            col[steps] = vals
+            columns[k] = col
+    return columns
+
+def read_columns_runs(paths, keys):
+    """
+    read_columns over many runs; returns a list of {key: array}, one per path
+    """
+    return [read_columns(path, keys) for path in paths]
 
 def read_tb(path):
     """
@@ -52,6 +52,10 @@ class LnLstmPolicy(object):
         self.S = S
         self.pi = pi
         self.vf = vf
+        self.a0 = a0
+        self.v0 = v0
+        self.neglogp0 = neglogp0
+        self.snew = snew
         self.step = step
         self.value = value
 
@@ -94,6 +98,10 @@ class LstmPolicy(object):
         self.S = S
         self.pi = pi
         self.vf = vf
+        self.a0 = a0
+        self.v0 = v0
+        self.neglogp0 = neglogp0
+        self.snew = snew
         self.step = step
         self.value = value
 
@@ -126,6 +134,9 @@ class CnnPolicy(object):
         self.X = X
         self.pi = pi
         self.vf = vf
+        self.a0 = a0
+        self.v0 = vf
+        self.neglogp0 = neglogp0
         self.step = step
         self.value = value
 
@@ -164,5 +175,8 @@ class MlpPolicy(object):
         self.X = X
         self.pi = pi
         self.vf = vf
+        self.a0 = a0
+        self.v0 = vf
+        self.neglogp0 = neglogp0
         self.step = step
         self.value = value
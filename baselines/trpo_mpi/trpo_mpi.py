@@ -7,7 +7,9 @@ from baselines.common import colorize
 from mpi4py import MPI
 from collections import deque
 from baselines.common.mpi_adam import MpiAdam
-from baselines.common.cg import cg
+from baselines.common.mpi_compression import get_compressor
+from baselines.common.mpi_hierarchical import get_comm
+from baselines.common.cg import cg, get_precond
 from contextlib import contextmanager
 
 def traj_segment_generator(pi, env, horizon, stochastic):
@@ -33,7 +35,8 @@ def traj_segment_generator(pi, env, horizon, stochastic):
 
     while True:
         prevac = ac
-        ac, vpred = pi.act(stochastic, ob)
+        with logger.profile('act'):
+            ac, vpred = pi.act(stochastic, ob)
         # Slight weirdness here because we need value function at time T
         # before returning segment [0, T-1] so we get the correct
         # terminal value
@@ -53,7 +56,8 @@ def traj_segment_generator(pi, env, horizon, stochastic):
         acs[i] = ac
         prevacs[i] = prevac
 
-        ob, rew, new, _ = env.step(ac)
+        with logger.profile('env_step'):
+            ob, rew, new, _ = env.step(ac)
         rews[i] = rew
 
         cur_ep_ret += rew
@@ -85,6 +89,11 @@ def learn(env, policy_fn, *,
         gamma, lam, # advantage estimation
         entcoeff=0.0,
         cg_damping=1e-2,
+        fisher_subsample=0.2, # fraction of the segment used for Fisher-vector products
+        cg_precond=None, # None or 'jacobi'
+        precond_probes=4, # Fisher-vector products spent estimating the Jacobi preconditioner
+        compression=None, # None, 'fp16' or 'topk' compression of the gradient / Fisher-vector exchange
+        topk_ratio=0.01,
         vf_stepsize=3e-4,
         vf_iters =3,
         max_timesteps=0, max_episodes=0, max_iters=0,  # time constraint
@@ -125,7 +134,7 @@ def learn(env, policy_fn, *,
     all_var_list = pi.get_trainable_variables()
     var_list = [v for v in all_var_list if v.name.split("/")[1].startswith("pol")]
     vf_var_list = [v for v in all_var_list if v.name.split("/")[1].startswith("vf")]
-    vfadam = MpiAdam(vf_var_list)
+    vfadam = MpiAdam(vf_var_list, compression=compression, topk_ratio=topk_ratio)
 
     get_flat = U.GetFlat(var_list)
     set_from_flat = U.SetFromFlat(var_list)
@@ -150,20 +159,29 @@ def learn(env, policy_fn, *,
 
     @contextmanager
     def timed(msg):
-        if rank == 0:
-            print(colorize(msg, color='magenta'))
-            tstart = time.time()
-            yield
-            print(colorize("done in %.3f seconds"%(time.time() - tstart), color='magenta'))
-        else:
-            yield
+        with logger.profile(msg):
+            if rank == 0:
+                print(colorize(msg, color='magenta'))
+                tstart = time.time()
+                yield
+                print(colorize("done in %.3f seconds"%(time.time() - tstart), color='magenta'))
+            else:
+                yield
 
-    def allmean(x):
+    # one compressor per reduced quantity: top-k error feedback is only valid within a single gradient stream.
+    # vfadam reduces (and compresses) its local gradients itself.
+    pg_comp = get_compressor(compression, name='pg', ratio=topk_ratio)
+    vec_comp = get_compressor(compression, name='fvp', grad=False)
+
+    def allmean(x, compressor=None):
         assert isinstance(x, np.ndarray)
-        out = np.empty_like(x)
-        MPI.COMM_WORLD.Allreduce(x, out, op=MPI.SUM)
-        out /= nworkers
-        return out
+        with logger.profile('mpi_allmean'):
+            if compressor is not None:
+                return compressor.allreduce(x) / nworkers
+            out = np.empty_like(x)
+            get_comm().Allreduce(x, out, op=MPI.SUM)
+            out /= nworkers
+            return out
 
     U.initialize()
     th_init = get_flat()
@@ -208,20 +226,25 @@ def learn(env, policy_fn, *,
         if hasattr(pi, "ob_rms"): pi.ob_rms.update(ob) # update running mean/std for policy
 
         args = seg["ob"], seg["ac"], atarg
-        fvpargs = [arr[::5] for arr in args]
+        # Fisher-vector products use a random subsample of the segment, fixed for this iteration
+        nsub = max(1, int(np.ceil(fisher_subsample * len(atarg))))
+        fvpidx = np.sort(np.random.choice(len(atarg), nsub, replace=False))
+        fvpargs = [arr[fvpidx] for arr in args]
         def fisher_vector_product(p):
-            return allmean(compute_fvp(p, *fvpargs)) + cg_damping * p
+            return allmean(compute_fvp(p, *fvpargs), vec_comp) + cg_damping * p
 
         assign_old_eq_new() # set old parameter values to new parameter values
         with timed("computegrad"):
             *lossbefore, g = compute_lossandgrad(*args)
         lossbefore = allmean(np.array(lossbefore))
-        g = allmean(g)
+        g = allmean(g, pg_comp)
         if np.allclose(g, 0):
             logger.log("Got zero gradient. not updating")
         else:
             with timed("cg"):
-                stepdir = cg(fisher_vector_product, g, cg_iters=cg_iters, verbose=rank==0)
+                precond = get_precond(cg_precond, lambda p: compute_fvp(p, *fvpargs), g.size, cg_damping,
+                                      nprobes=precond_probes, reduce=lambda d: allmean(d, vec_comp))
+                stepdir = cg(fisher_vector_product, g, cg_iters=cg_iters, precond=precond, verbose=rank==0)
             assert np.isfinite(stepdir).all()
             shs = .5*stepdir.dot(fisher_vector_product(stepdir))
             lm = np.sqrt(shs / max_kl)
@@ -262,7 +285,7 @@ def learn(env, policy_fn, *,
             for _ in range(vf_iters):
                 for (mbob, mbret) in dataset.iterbatches((seg["ob"], seg["tdlamret"]),
                 include_final_partial_batch=False, batch_size=64):
-                    g = allmean(compute_vflossandgrad(mbob, mbret))
+                    g = compute_vflossandgrad(mbob, mbret)
                     vfadam.update(g, vf_stepsize)
 
         logger.record_tabular("ev_tdlam_before", explained_variance(vpredbefore, tdlamret))
@@ -285,7 +308,10 @@ def learn(env, policy_fn, *,
         logger.record_tabular("TimeElapsed", time.time() - tstart)
 
         if rank==0:
-            logger.dump_tabular()
+            with logger.profile('logging'):
+                logger.dump_tabular()
+        else:
+            logger.clear_profile()
 
 def flatten_lists(listoflists):
     return [el for list_ in listoflists for el in list_]
\ No newline at end of file